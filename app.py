@@ -1,48 +1,85 @@
+import os
+import time
 import streamlit as st
-
-from chatbot.chatbot_message_sender import ChatbotMessageSender
-from clovastudio.clovastudio_completion_executor import sentence_refine
+from dotenv import load_dotenv
+
+from chatbot.chatbot_answer import call_chatbot, should_cache_reply, ANSWER_MODE, COLLECTION_NAME
+from chatbot.chatbot_answer_cache import AnswerCache
+from chatbot.chatbot_answer_router import route_question, call_routed, log_route
+from common import clova_tracing as tracing
+
+# 설정은 앱 프로세스에서 한 번만 읽음 (Streamlit은 상호작용마다 이 스크립트 전체를 다시 실행)
+@st.cache_resource
+def load_config():
+    # .env 파일 로드
+    load_dotenv()
+    return {
+        # 유사 질문(embedding 유사도) 캐시 사용 여부
+        "answer_cache_semantic": os.getenv("ANSWER-CACHE-SEMANTIC", "true").lower() == "true"
+    }
+
+CONFIG = load_config()
+
+# RAG 모듈 + Milvus 컬렉션은 앱 프로세스에서 한 번만 준비 (Streamlit 재실행 시 재사용)
+@st.cache_resource
+def get_rag():
+    import rag.clova_rag_module as rag
+    rag.warm_up(COLLECTION_NAME)
+    return rag
+
+# 답변 캐시는 앱 프로세스 전체에서 공유 (모든 세션의 질문이 같은 캐시를 사용)
+@st.cache_resource
+def get_answer_cache():
+    def embed(question):
+        import rag.clova_rag_module as rag
+        return rag.query_embed(question)
+
+    return AnswerCache(COLLECTION_NAME, embed_fn=embed if CONFIG["answer_cache_semantic"] else None)
 
 # 하이퍼 클로바 X
 def call_hyper_clovax(user_message):
-    # rag 방식
-    # collection_name = "potenday_faq"
-    # return rag.chat_with_rag(user_message, collection_name)
-
-    # chatbot 방식
-    chatbotMessageSender = ChatbotMessageSender()
-    res = chatbotMessageSender.req_message_send(user_message)
-    reply = res.json()['content'][0]['data']['details']
-
-    # 실패 메세지 반환 시, clova studio 문장 교정 후 재요청
-    if reply == "제가 알지 못하는 내용이에요. 도와주세요 오잉님!":
-        # 문장 교정
-        st.text("1차 요청에 실패해서 문장 교정을 시작합니다.")
-        question_count, questions = sentence_refine(user_message)
-        st.text(questions)
-
-        # chatbot 재요청
-        answers = []
-        for q in questions:
-            q = q.strip()
-            res = chatbotMessageSender.req_message_send(user_message)
-            reply = res.json()['content'][0]['data']['details']
-            answers.append(reply)
-            st.text(reply)
-
-        # 답변 중복 제거 후 통합
-        final_reply = '\n'.join(set(answers))
-
-        return final_reply
-    
-    # 성공 메세지 반환 시, 그대로 리턴
-    else:
+    # rag 방식 : 생성되는 토큰을 바로 화면에 출력하고, 완성된 답변을 반환
+    if ANSWER_MODE == "rag":
+        return st.write_stream(get_rag().chat_with_rag_stream(user_message, COLLECTION_NAME))
+
+    # auto 방식 : 어휘 검색 점수로 경로 선택 (rag로 결정되면 rag 방식처럼 스트리밍)
+    if ANSWER_MODE == "auto":
+        get_rag()
+        started = time.perf_counter()
+        decision = route_question(user_message, COLLECTION_NAME)
+        if decision["route"] != "rag":
+            return call_routed(user_message, COLLECTION_NAME, notify=st.text, decision=decision)
+        reply = st.write_stream(get_rag().chat_with_rag_stream(user_message, COLLECTION_NAME))
+        log_route(user_message, decision, "rag", reply, started)
         return reply
 
+    # chatbot 방식 : 진행 상황은 화면에 출력
+    return call_chatbot(user_message, notify=st.text)
+
+
+# 캐시된 답변이 있으면 바로 반환, 없으면 하이퍼 클로바 X 호출 후 캐시에 저장
+def answer_with_cache(user_message):
+    answer_cache = get_answer_cache()
+    with tracing.span("answer_cache.lookup"):
+        cached_reply, question_vector = answer_cache.lookup(user_message)
+    if cached_reply is not None:
+        return cached_reply
+
+    reply = call_hyper_clovax(user_message)
+
+    if should_cache_reply(reply):
+        answer_cache.put(user_message, reply, question_vector)
+
+    return reply
+
 
 # Streamlit 페이지 제목 설정
 st.title("포텐데이 FAQ 테스트")
 
+# 첫 질문이 아니라 앱 시작 시점에 연결/로딩 비용을 지불
+if ANSWER_MODE in ("rag", "auto"):
+    get_rag()
+
 # 세션 상태에서 입력 필드와 채팅 기록을 관리
 if 'chat_history' not in st.session_state:
     st.session_state['chat_history'] = []
@@ -57,10 +94,12 @@ def submit_message():
     
     if user_message:
         # API 호출하여 응답 받기
-        response = call_hyper_clovax(user_message)
+        # 단계별 소요 시간을 함께 기록
+        with tracing.trace("answer") as answer_trace:
+            response = answer_with_cache(user_message)
         
         # 채팅 기록에 사용자 메시지와 AI 응답 추가
-        st.session_state.chat_history.append({"user": user_message, "bot": response})
+        st.session_state.chat_history.append({"user": user_message, "bot": response, "trace": answer_trace.breakdown()})
 
         # 입력 필드 비우기
         st.session_state['input_text'] = ""
@@ -69,6 +108,17 @@ def submit_message():
 def clear_chat():
     st.session_state['chat_history'] = []
 
+# 답변 캐시 지표
+with st.sidebar:
+    st.caption("답변 캐시")
+    st.json(get_answer_cache().stats())
+
+    # 디버그 : 단계별 소요 시간 (질문별 breakdown + 프로세스 전체 p50/p95/p99)
+    show_trace = st.toggle("단계별 소요 시간 보기", key="show_trace")
+    if show_trace:
+        st.caption("단계별 소요 시간 (ms)")
+        st.dataframe(tracing.stage_stats(), use_container_width=True)
+
 # 채팅 입력을 위한 텍스트 박스
 st.text_input("질문을 입력하세요:", 
               key="input_text", 
@@ -82,4 +132,7 @@ if st.button("대화 내역 지우기"):
 for chat in reversed(st.session_state.chat_history):
     st.write(f"**👤 사용자:** {chat['user']}")
     st.write(f"**🍀 CLOVA:** {chat['bot']}")
+    if show_trace and chat.get("trace"):
+        with st.expander(f"소요 시간 {chat['trace']['elapsed_ms']}ms"):
+            st.dataframe(chat["trace"]["spans"], use_container_width=True)
     st.divider()
@@ -0,0 +1,62 @@
+import json
+import argparse
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as report_file:
+        return json.load(report_file)
+
+
+def _change(before, after):
+    return f"{(after - before) / before * 100:+.1f}%" if before else "-"
+
+
+# ---------------------------
+# 두 벤치마크 결과 비교 : 적재 처리량 + 시작 시간 + 시나리오/동시 요청 수별 처리량, p50/p95
+# ---------------------------
+def compare(before, after):
+    print(f"before: {before['git']['commit'][:8]} {before['git']['subject']}")
+    print(f"after : {after['git']['commit'][:8]} {after['git']['subject']}")
+    if before.get("config") != after.get("config"):
+        print("주의: 두 결과의 벤치마크 설정이 다릅니다")
+
+    ingest_before, ingest_after = before["ingestion"], after["ingestion"]
+    print(f"\n{'적재':<24}{'before':>12}{'after':>12}{'change':>10}")
+    for key in ["chunks_per_second", "full_seconds", "noop_sync_seconds"]:
+        print(f"{key:<24}{ingest_before[key]:>12.2f}{ingest_after[key]:>12.2f}{_change(ingest_before[key], ingest_after[key]):>10}")
+
+    startup_before, startup_after = before.get("startup") or {}, after.get("startup") or {}
+    rows = [(f"import {module}", startup_before["imports"][module]["seconds_min"], value["seconds_min"])
+            for module, value in startup_after.get("imports", {}).items() if module in startup_before.get("imports", {})]
+    for mode, value in startup_after.get("app", {}).items():
+        if mode in startup_before.get("app", {}):
+            rows.append((f"app {mode} first run", startup_before["app"][mode]["first_run_seconds"], value["first_run_seconds"]))
+            rows.append((f"app {mode} rerun", startup_before["app"][mode]["rerun_seconds"], value["rerun_seconds"]))
+    if rows:
+        print(f"\n{'시작 시간(ms)':<40}{'before':>10}{'after':>10}{'change':>10}")
+        for name, old_value, new_value in rows:
+            print(f"{name:<40}{old_value * 1000:>10.0f}{new_value * 1000:>10.0f}{_change(old_value, new_value):>10}")
+
+    print(f"\n{'scenario':<16}{'conc':>6}{'rps':>16}{'p50(ms)':>22}{'p95(ms)':>22}")
+    previous = {(row["scenario"], row["concurrency"]): row for row in before["queries"]}
+    for row in after["queries"]:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        cells = [
+            (old["throughput_rps"], row["throughput_rps"]),
+            (old["latency_ms"]["p50"], row["latency_ms"]["p50"]),
+            (old["latency_ms"]["p95"], row["latency_ms"]["p95"])
+        ]
+        line = f"{row['scenario']:<16}{row['concurrency']:>6}"
+        for old_value, new_value in cells:
+            line += f"{old_value:>7.1f}->{new_value:<7.1f}{_change(old_value, new_value):>7}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="벤치마크 결과 비교")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    compare(_load(args.before), _load(args.after))
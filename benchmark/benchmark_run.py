@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import subprocess
+import tempfile
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / "benchmark" / "results"
+
+# 합성 코퍼스 문장 재료 (실제 코퍼스가 없을 때 사용)
+_TOPICS = ["팀 빌딩", "중간 산출물", "최종 발표", "상금", "API 크레딧", "멘토링", "심사 기준", "참가 자격", "숙소", "일정"]
+_FACTS = [
+    "{topic} 관련 안내는 공지 채널에서 확인할 수 있어요.",
+    "{topic}은 day{day} 자정까지 완료해야 합니다.",
+    "{topic} 문의는 운영진 오픈채팅으로 남겨주세요.",
+    "{topic}의 세부 규정은 참가자 가이드 {day}장을 참고하세요.",
+    "{topic}은 팀당 최대 {count}명까지 가능합니다.",
+    "{topic} 결과는 발표 후 {day}일 이내에 메일로 안내됩니다."
+]
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "subject": git("log", "-1", "--format=%s"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99),
+            "mean": sum(ordered) / len(ordered) * 1000, "max": ordered[-1] * 1000}
+
+
+def make_synthetic_corpus(corpus_dir, docs, seed):
+    rng = random.Random(seed)
+    html_dir = corpus_dir / "potendayguide"
+    html_dir.mkdir(parents=True, exist_ok=True)
+    url_map = {}
+    for doc_no in range(docs):
+        topic = _TOPICS[doc_no % len(_TOPICS)]
+        paragraphs = []
+        for _ in range(rng.randint(4, 10)):
+            sentences = [rng.choice(_FACTS).format(topic=topic, day=rng.randint(1, 9), count=rng.randint(2, 6)) for _ in range(rng.randint(2, 5))]
+            paragraphs.append(" ".join(sentences))
+        file_name = f"guide_{doc_no:04d}.html"
+        body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+        (html_dir / file_name).write_text(f"<html><body><h1>{topic} 안내 {doc_no}</h1>{body}</body></html>", encoding="utf-8")
+        url_map[file_name] = f"https://example.com/potenday/{doc_no:04d}"
+    (corpus_dir / "filename_to_url_map.json").write_text(json.dumps(url_map, ensure_ascii=False), encoding="utf-8")
+
+
+def prepare_workdir(args):
+    # 벤치마크 전용 작업 디렉토리 : 코퍼스 + 비어 있는 캐시 (실제 .rag_cache는 건드리지 않음)
+    workdir = Path(tempfile.mkdtemp(prefix="potenday-bench-"))
+    if args.corpus:
+        shutil.copytree(Path(args.corpus) / "potendayguide", workdir / "potendayguide")
+        shutil.copy(Path(args.corpus) / "filename_to_url_map.json", workdir / "filename_to_url_map.json")
+    else:
+        make_synthetic_corpus(workdir, args.docs, args.seed)
+    return workdir
+
+
+def start_stub(args):
+    command = [sys.executable, "-m", "benchmark.benchmark_stub_server", "--port", str(args.stub_port), "--seed", str(args.seed),
+               "--fallback-rate", str(args.fallback_rate)]
+    for value in args.latency or []:
+        command += ["--latency", value]
+    for value in args.error_rate or []:
+        command += ["--error-rate", value]
+    process = subprocess.Popen(command, cwd=REPO_ROOT)
+
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{args.stub_port}/healthz", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("stub 서버가 시작되지 않았습니다")
+
+
+def stub_stats(args):
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.stub_port}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+def configure_environment(args, workdir):
+    # 모듈 설정값은 import 시점에 읽히므로 RAG/chatbot 모듈을 import 하기 전에 설정
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    os.environ.update({
+        "CLOVASTUDIO-HOST": stub_url,
+        "CLOVASTUDIO-APIGW-HOST": stub_url,
+        "CLOVA-CHATBOT-URL": f"{stub_url}/chatbot",
+        "SECRET-KEY": "benchmark",
+        "X-NCP-CLOVASTUDIO-API-KEY": "benchmark",
+        "X-NCP-APIGW-API-KEY": "benchmark",
+        "RAG-BACKEND": "local",
+        "RAG-CACHE-DIR": str(workdir / ".rag_cache"),
+        "TRACE-LOG-PATH": ""
+    })
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+# ---------------------------
+# 적재 처리량 : 전체 재적재 (cold) -> 변경 없는 증분 동기화 (warm)
+# ---------------------------
+def bench_ingestion(collection_name):
+    import rag.clova_rag_module as rag
+    from common.clova_http_client import connection_stats
+
+    started = time.perf_counter()
+    rag.sync_collection(collection_name, full=True, backend="local")
+    full_seconds = time.perf_counter() - started
+    chunks = rag.get_collection(collection_name, "local").num_entities
+
+    started = time.perf_counter()
+    rag.sync_collection(collection_name, full=False, backend="local")
+    noop_seconds = time.perf_counter() - started
+
+    return {
+        "html_files": len(rag.list_html_files()),
+        "chunks": chunks,
+        "full_seconds": full_seconds,
+        "chunks_per_second": chunks / full_seconds if full_seconds else 0.0,
+        "noop_sync_seconds": noop_seconds,
+        "http": connection_stats()
+    }
+
+
+def sample_questions(collection_name, count, seed):
+    # 적재된 chunk 문장의 앞부분을 질문으로 사용 (요청마다 다른 질문이 되도록 번호를 붙여 embedding 캐시 적중을 피함)
+    import rag.clova_rag_module as rag
+    rng = random.Random(seed)
+    texts = [text for _, _, text in rag.get_collection(collection_name, "local").rows()]
+    return [f"{rng.choice(texts)[:40]} ({i})" for i in range(count)]
+
+
+def run_threaded(func, questions, concurrency):
+    latencies, errors = [], 0
+
+    def timed(question):
+        started = time.perf_counter()
+        func(question)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(timed, question) for question in questions]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"요청 실패: {e}")
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_async(func, questions, concurrency):
+    async def main():
+        from common.clova_async_http_client import close_async_client
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def timed(question):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await func(question)
+                    latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors += 1
+                    print(f"요청 실패: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*[timed(question) for question in questions])
+        elapsed = time.perf_counter() - started
+        await close_async_client()
+        return latencies, errors, elapsed
+
+    return asyncio.run(main())
+
+
+# ---------------------------
+# 질의 지연 시간 / 처리량 : 시나리오 x 동시 요청 수
+# ---------------------------
+def bench_queries(collection_name, scenarios, concurrency_levels, requests_per_level, seed):
+    import rag.clova_rag_module as rag
+    from chatbot.chatbot_answer import call_chatbot, acall_chatbot
+
+    quiet = lambda *args, **kwargs: None
+    runners = {
+        "rag": lambda q: rag.chat_with_rag(q, collection_name, "local"),
+        "rag_async": lambda q: rag.achat_with_rag(q, collection_name, "local"),
+        "chatbot": lambda q: call_chatbot(q, notify=quiet),
+        "chatbot_async": lambda q: acall_chatbot(q, notify=quiet)
+    }
+
+    results = []
+    for scenario in scenarios:
+        for concurrency in concurrency_levels:
+            questions = sample_questions(collection_name, requests_per_level, f"{seed}-{scenario}-{concurrency}")
+            runner = runners[scenario]
+            if scenario.endswith("_async"):
+                latencies, errors, elapsed = run_async(runner, questions, concurrency)
+            else:
+                latencies, errors, elapsed = run_threaded(runner, questions, concurrency)
+
+            result = {
+                "scenario": scenario,
+                "concurrency": concurrency,
+                "requests": len(questions),
+                "errors": errors,
+                "seconds": elapsed,
+                "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+                "latency_ms": percentiles(latencies)
+            }
+            print(f"[{scenario} x{concurrency}] {result['throughput_rps']:.1f} req/s, "
+                  f"p50 {result['latency_ms']['p50']:.0f}ms, p95 {result['latency_ms']['p95']:.0f}ms, 실패 {errors}건")
+            results.append(result)
+    return results
+
+
+# ---------------------------
+# 시작 시간 : 모듈 import 시간(새 프로세스) + Streamlit 앱 첫 실행 / 재실행 시간
+#   재실행은 사용자가 입력할 때마다 Streamlit이 app.py를 다시 실행하는 비용 (질의 경로)
+# ---------------------------
+STARTUP_MODULES = ["chatbot.chatbot_answer", "chatbot.chatbot_answer_router", "rag.clova_rag_module", "server"]
+HEAVY_MODULES = ["langchain_community", "unstructured", "pymilvus", "pandas", "tqdm", "httpx"]
+
+_IMPORT_PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+_APP_PROBE = """
+import sys, json, time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+app = AppTest.from_file("app.py", default_timeout=60)
+app.run()
+first = time.perf_counter() - started
+started = time.perf_counter()
+app.run()
+print(json.dumps({{"first_run_seconds": first, "rerun_seconds": time.perf_counter() - started,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def _probe(code, env=None):
+    completed = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True,
+                               env=dict(os.environ, **(env or {})))
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(repeat, app_modes):
+    imports = {}
+    for module in STARTUP_MODULES:
+        samples = [_probe(_IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)) for _ in range(repeat)]
+        imports[module] = {
+            "seconds_min": min(sample["seconds"] for sample in samples),
+            "seconds_median": sorted(sample["seconds"] for sample in samples)[len(samples) // 2],
+            "heavy_modules": samples[0]["heavy"]
+        }
+        print(f"import {module}: {imports[module]['seconds_min'] * 1000:.0f}ms, 무거운 모듈 {imports[module]['heavy_modules'] or '-'}")
+
+    app = {}
+    for mode in app_modes:
+        try:
+            samples = [_probe(_APP_PROBE.format(heavy=HEAVY_MODULES), {"ANSWER-MODE": mode}) for _ in range(repeat)]
+        except (RuntimeError, ValueError) as e:
+            print(f"Streamlit 앱({mode}) 시작 시간 측정 실패: {e}")
+            continue
+        app[mode] = {
+            "first_run_seconds": min(sample["first_run_seconds"] for sample in samples),
+            "rerun_seconds": min(sample["rerun_seconds"] for sample in samples),
+            "heavy_modules": samples[0]["heavy"]
+        }
+        print(f"Streamlit 앱({mode}): 첫 실행 {app[mode]['first_run_seconds'] * 1000:.0f}ms, "
+              f"재실행 {app[mode]['rerun_seconds'] * 1000:.0f}ms, 무거운 모듈 {app[mode]['heavy_modules'] or '-'}")
+
+    return {"imports": imports, "app": app}
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="포텐데이 FAQ 오프라인 벤치마크 (로컬 stub API 사용)")
+    parser.add_argument("--corpus", help="potendayguide/ 와 filename_to_url_map.json 이 있는 디렉토리 (없으면 합성 코퍼스)")
+    parser.add_argument("--docs", type=int, default=50, help="합성 코퍼스 HTML 파일 수")
+    parser.add_argument("--scenarios", default="rag,rag_async,chatbot,chatbot_async")
+    parser.add_argument("--concurrency", default="1,8,32", help="동시 요청 수 목록")
+    parser.add_argument("--requests", type=int, default=64, help="동시 요청 수별 요청 수")
+    parser.add_argument("--stub-port", type=int, default=18080)
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=MS", help="stub endpoint 지연 시간(ms)")
+    parser.add_argument("--error-rate", action="append", metavar="ENDPOINT=RATE", help="stub endpoint 오류율")
+    parser.add_argument("--fallback-rate", type=float, default=0.0, help="chatbot stub이 답변하지 못하는 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup-repeat", type=int, default=3, help="시작 시간 측정 반복 횟수 (0이면 측정하지 않음)")
+    parser.add_argument("--app-modes", default="chatbot,rag", help="시작 시간을 측정할 Streamlit 앱 ANSWER-MODE 목록")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: benchmark/results/<시각>-<commit>.json)")
+    return parser
+
+
+def main():
+    args = build_arg_parser().parse_args()
+    revision = git_revision()
+    output = Path(args.output).resolve() if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{revision['commit'][:8]}.json"
+    workdir = prepare_workdir(args)
+    stub = start_stub(args)
+    collection_name = "benchmark_faq"
+
+    try:
+        configure_environment(args, workdir)
+        from common import clova_tracing as tracing
+
+        ingestion = bench_ingestion(collection_name)
+        print(f"적재: chunk {ingestion['chunks']}개, {ingestion['full_seconds']:.1f}s ({ingestion['chunks_per_second']:.1f} chunks/s)")
+
+        startup = bench_startup(
+            args.startup_repeat,
+            [mode.strip() for mode in args.app_modes.split(",") if mode.strip()]
+        ) if args.startup_repeat > 0 else None
+
+        queries = bench_queries(
+            collection_name,
+            [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()],
+            [int(level) for level in args.concurrency.split(",")],
+            args.requests,
+            args.seed
+        )
+
+        report = {
+            "git": revision,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "corpus": args.corpus or f"synthetic:{args.docs}",
+                "requests_per_level": args.requests,
+                "latency_ms": args.latency or [],
+                "error_rate": args.error_rate or [],
+                "fallback_rate": args.fallback_rate,
+                "seed": args.seed
+            },
+            "ingestion": ingestion,
+            "startup": startup,
+            "queries": queries,
+            "stages": tracing.stage_stats(),
+            "completion_tokens": tracing.usage_stats(),
+            "stub": stub_stats(args)
+        }
+    finally:
+        stub.terminate()
+        stub.wait()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"벤치마크 결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import re
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+
+import numpy as np
+from aiohttp import web
+
+EMBEDDING_DIM = 1024
+
+# endpoint별 기본 지연 시간(ms) / 오류율
+#   completion은 첫 토큰까지의 지연, completion_token은 토큰 사이 지연
+DEFAULT_LATENCY_MS = {
+    "segmentation": 300,
+    "embedding": 60,
+    "completion": 400,
+    "completion_token": 15,
+    "refine": 300,
+    "chatbot": 150
+}
+DEFAULT_ERROR_RATE = {
+    "segmentation": 0.0,
+    "embedding": 0.0,
+    "completion": 0.0,
+    "refine": 0.0,
+    "chatbot": 0.0
+}
+
+CHATBOT_FALLBACK_MESSAGE = "제가 알지 못하는 내용이에요. 도와주세요 오잉님!"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.?!다요])\s+|\n+")
+
+
+def fake_embedding(text):
+    # 문자 2-gram을 hashing 한 정규화 벡터 : 글자가 많이 겹치는 문장끼리 내적이 큼 (검색 결과가 의미 있도록)
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    text = re.sub(r"\s+", " ", text.lower())
+    for i in range(max(1, len(text) - 1)):
+        digest = hashlib.blake2b(text[i:i + 2].encode("utf-8"), digest_size=4).digest()
+        vector[int.from_bytes(digest, "little") % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def segment_text(text, max_size):
+    # 문장 단위로 나눈 뒤 max_size 글자를 넘지 않도록 묶음
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+    segments, current, size = [], [], 0
+    for sentence in sentences:
+        if current and size + len(sentence) > max_size:
+            segments.append(current)
+            current, size = [], 0
+        current.append(sentence)
+        size += len(sentence)
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+# ---------------------------
+# CLOVA Studio / CLOVA Chatbot stub : 실제 API와 같은 경로/응답 형식, 지연 시간과 오류율은 설정값 사용
+# ---------------------------
+class StubServer:
+    def __init__(self, latency_ms=None, error_rate=None, fallback_rate=0.0, seed=0):
+        self.latency_ms = dict(DEFAULT_LATENCY_MS, **(latency_ms or {}))
+        self.error_rate = dict(DEFAULT_ERROR_RATE, **(error_rate or {}))
+        self.fallback_rate = fallback_rate
+        self.random = random.Random(seed)
+        self.requests = {name: 0 for name in DEFAULT_ERROR_RATE}
+        self.errors = {name: 0 for name in DEFAULT_ERROR_RATE}
+
+    async def _delay(self, name):
+        # 평균 latency_ms, ±20% jitter
+        latency = self.latency_ms[name] / 1000
+        await asyncio.sleep(max(0.0, self.random.uniform(latency * 0.8, latency * 1.2)))
+
+    def _should_fail(self, name):
+        self.requests[name] += 1
+        if self.random.random() < self.error_rate[name]:
+            self.errors[name] += 1
+            return True
+        return False
+
+    async def segmentation(self, request):
+        body = await request.json()
+        await self._delay("segmentation")
+        if self._should_fail("segmentation"):
+            return web.json_response({"status": {"code": "50000", "message": "stub error"}, "result": None}, status=500)
+        max_size = body.get("postProcessMaxSize", 100)
+        max_size = max_size if max_size and max_size > 0 else 100
+        return web.json_response({
+            "status": {"code": "20000", "message": "OK"},
+            "result": {"topicSeg": segment_text(body.get("text", ""), max_size)}
+        })
+
+    async def embedding(self, request):
+        body = await request.json()
+        await self._delay("embedding")
+        if self._should_fail("embedding"):
+            return web.json_response({"status": {"code": "42901", "message": "Too many requests"}, "result": None}, status=429)
+        return web.json_response({
+            "status": {"code": "20000", "message": "OK"},
+            "result": {"embedding": fake_embedding(body.get("text", "")), "inputTokens": len(body.get("text", ""))}
+        })
+
+    async def _stream_answer(self, request, name, answer, input_length):
+        await self._delay(name)
+        if self._should_fail(name):
+            return web.json_response({"status": {"code": "50000", "message": "stub error"}}, status=500)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        tokens = re.findall(r"\S+\s*", answer)
+        for token in tokens:
+            await response.write(_sse("token", {"message": {"role": "assistant", "content": token}}))
+            await asyncio.sleep(self.latency_ms["completion_token"] / 1000)
+        await response.write(_sse("result", {
+            "message": {"role": "assistant", "content": answer},
+            "inputLength": input_length,
+            "outputLength": len(tokens),
+            "stopReason": "stop_before"
+        }))
+        return response
+
+    async def completion(self, request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        question = messages[-1]["content"] if messages else ""
+        references = [m["content"] for m in messages if m.get("role") == "system" and m.get("content", "").startswith("reference:")]
+        if references:
+            answer = f"{question}에 대한 답변이에요. {references[0][len('reference:'):80].strip()} {{출처: stub}}"
+        else:
+            answer = "오잉님, 도와주세요."
+        return await self._stream_answer(request, "completion", answer, sum(len(m.get("content", "")) for m in messages))
+
+    async def refine(self, request):
+        # 문장 교정 : '그리고'로 이어진 질문을 나눔
+        body = await request.json()
+        messages = body.get("messages", [])
+        question = messages[-1]["content"] if messages else ""
+        questions = [q.strip() for q in question.split("그리고") if q.strip()] or [question]
+        answer = f"질문 수 : {len(questions)}개\n" + "\n".join(f"질문 : {q}" for q in questions)
+        return await self._stream_answer(request, "refine", answer, sum(len(m.get("content", "")) for m in messages))
+
+    async def chatbot(self, request):
+        body = json.loads(await request.text())
+        await self._delay("chatbot")
+        if self._should_fail("chatbot"):
+            return web.json_response({"message": "stub error"}, status=500)
+        question = body["content"][0]["data"]["details"]
+        if "그리고" in question or self.random.random() < self.fallback_rate:
+            reply = CHATBOT_FALLBACK_MESSAGE
+        else:
+            reply = f"'{question}'에 대한 FAQ 답변입니다."
+        return web.json_response({"version": "v2", "userId": body.get("userId"), "timestamp": body.get("timestamp"),
+                                  "content": [{"type": "text", "data": {"details": reply}}], "event": "send"})
+
+    async def healthz(self, request):
+        return web.json_response({"status": "ok"})
+
+    async def stats(self, request):
+        return web.json_response({"requests": self.requests, "errors": self.errors})
+
+    def create_app(self):
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/testapp/v1/api-tools/segmentation/{app_id}", self.segmentation)
+        app.router.add_post("/testapp/v1/api-tools/embedding/v2/{app_id}", self.embedding)
+        app.router.add_post("/testapp/v1/chat-completions/HCX-DASH-001", self.completion)
+        app.router.add_post("/testapp/v1/chat-completions/HCX-003", self.refine)
+        app.router.add_post("/chatbot", self.chatbot)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+def parse_overrides(values, cast=float):
+    # ["embedding=100", "chatbot=50"] -> {"embedding": 100.0, "chatbot": 50.0}
+    overrides = {}
+    for value in values or []:
+        name, _, number = value.partition("=")
+        if name not in DEFAULT_LATENCY_MS and name not in DEFAULT_ERROR_RATE:
+            raise argparse.ArgumentTypeError(f"unknown endpoint: {name}")
+        overrides[name] = cast(number)
+    return overrides
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="CLOVA Studio / Chatbot stub 서버 (벤치마크용)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=MS",
+                        help=f"endpoint 지연 시간(ms), endpoint: {', '.join(DEFAULT_LATENCY_MS)}")
+    parser.add_argument("--error-rate", action="append", metavar="ENDPOINT=RATE",
+                        help=f"endpoint 오류율(0~1), endpoint: {', '.join(DEFAULT_ERROR_RATE)}")
+    parser.add_argument("--fallback-rate", type=float, default=0.0, help="chatbot이 답변하지 못하는 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    stub = StubServer(parse_overrides(args.latency), parse_overrides(args.error_rate), args.fallback_rate, args.seed)
+    web.run_app(stub.create_app(), host=args.host, port=args.port, print=None)
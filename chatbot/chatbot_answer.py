@@ -0,0 +1,103 @@
+import os
+from dotenv import load_dotenv
+
+from chatbot.chatbot_message_sender import ChatbotMessageSender, AsyncChatbotMessageSender
+from clovastudio.clovastudio_completion_executor import sentence_refine, asentence_refine
+from common import clova_tracing as tracing
+
+# .env 파일 로드
+load_dotenv()
+
+# 답변 방식 : chatbot(기본) / rag / auto(어휘 검색 점수로 chatbot, rag, 동시 호출 중 선택)
+ANSWER_MODE = os.getenv("ANSWER-MODE", "chatbot")
+COLLECTION_NAME = "potenday_faq"
+
+# 답변하지 못했을 때의 응답 (chatbot / rag)
+CHATBOT_FALLBACK_MESSAGE = "제가 알지 못하는 내용이에요. 도와주세요 오잉님!"
+RAG_FALLBACK_MESSAGE = "오잉님, 도와주세요"
+
+
+def should_cache_reply(reply):
+    # 답변하지 못한 응답은 캐시하지 않음
+    return bool(reply) and CHATBOT_FALLBACK_MESSAGE not in reply and RAG_FALLBACK_MESSAGE not in reply
+
+
+def merge_replies(questions, replies, notify=print):
+    answers = []
+    for q, reply in zip(questions, replies):
+        if reply is None:
+            notify(f"'{q}' 질문의 답변을 제한 시간 내에 받지 못했습니다.")
+            continue
+        answers.append(reply)
+        notify(reply)
+
+    # 답변 중복 제거 후 질문 순서대로 통합
+    return '\n'.join(dict.fromkeys(answers))
+
+
+# ---------------------------
+# chatbot 방식 : 실패 메세지 반환 시, clova studio 문장 교정 후 교정된 질문들을 동시에 재요청
+#   notify : 진행 상황 출력 함수 (Streamlit에서는 st.text)
+# ---------------------------
+def call_chatbot(user_message, notify=print):
+    chatbotMessageSender = ChatbotMessageSender()
+    reply = chatbotMessageSender.req_message_reply(user_message)
+
+    # 성공 메세지 반환 시, 그대로 리턴
+    if reply != CHATBOT_FALLBACK_MESSAGE:
+        return reply
+
+    # 문장 교정
+    notify("1차 요청에 실패해서 문장 교정을 시작합니다.")
+    with tracing.span("chatbot.refine"):
+        question_count, questions = sentence_refine(user_message)
+    notify(questions)
+
+    questions = [q.strip() for q in questions if q.strip()]
+    # 교정 결과가 원래 질문과 같으면 같은 질문을 다시 보내지 않음
+    if questions == [user_message.strip()]:
+        return reply
+
+    with tracing.span("chatbot.fanout"):
+        replies = chatbotMessageSender.req_messages_reply_parallel(questions)
+
+    return merge_replies(questions, replies, notify)
+
+
+async def acall_chatbot(user_message, notify=print):
+    chatbotMessageSender = AsyncChatbotMessageSender()
+    reply = await chatbotMessageSender.req_message_reply(user_message)
+
+    if reply != CHATBOT_FALLBACK_MESSAGE:
+        return reply
+
+    notify("1차 요청에 실패해서 문장 교정을 시작합니다.")
+    with tracing.span("chatbot.refine"):
+        question_count, questions = await asentence_refine(user_message)
+    notify(questions)
+
+    questions = [q.strip() for q in questions if q.strip()]
+    # 교정 결과가 원래 질문과 같으면 같은 질문을 다시 보내지 않음
+    if questions == [user_message.strip()]:
+        return reply
+
+    with tracing.span("chatbot.fanout"):
+        replies = await chatbotMessageSender.req_messages_reply_parallel(questions)
+
+    return merge_replies(questions, replies, notify)
+
+
+# ---------------------------
+# 하이퍼 클로바 X (asyncio) : 하나의 이벤트 루프에서 여러 사용자의 질문을 동시에 처리
+# ---------------------------
+async def acall_hyper_clovax(user_message, mode=ANSWER_MODE, collection_name=COLLECTION_NAME, notify=print):
+    if mode == "rag":
+        # RAG 모듈(langchain/pymilvus)은 rag 방식에서만 로드
+        import rag.clova_rag_module as rag
+        return await rag.achat_with_rag(user_message, collection_name)
+
+    if mode == "auto":
+        from chatbot.chatbot_answer_router import acall_routed
+        return await acall_routed(user_message, collection_name, notify)
+
+    return await acall_chatbot(user_message, notify)
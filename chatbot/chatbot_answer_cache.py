@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+import numpy as np
+
+from common.clova_corpus_version import read_corpus_version
+from common.clova_question_text import normalize_question
+
+# .env 파일 로드
+load_dotenv()
+
+# 답변 캐시 설정 : 유지 시간(초) / 최대 항목 수 / 유사 질문으로 판단할 코사인 유사도
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER-CACHE-TTL", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER-CACHE-MAX-ENTRIES", "1000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER-CACHE-SIMILARITY", "0.95"))
+
+
+class _Entry:
+    def __init__(self, answer, vector, expires_at):
+        self.answer = answer
+        self.vector = vector
+        self.expires_at = expires_at
+
+
+# ---------------------------
+# 답변 캐시 : 정규화된 질문 일치 + embedding 유사도 기반 유사 질문 일치 (TTL, LRU)
+#   collection_name : 답변에 사용하는 컬렉션 (이 컬렉션이 다시 적재되면 캐시 폐기)
+# ---------------------------
+class AnswerCache:
+    def __init__(self, collection_name, embed_fn=None, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY):
+        self._embed_fn = embed_fn
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._collection_name = collection_name
+        self._corpus_version = read_corpus_version(collection_name)
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lookup_seconds = 0.0
+
+    def _embed(self, question):
+        if self._embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self._embed_fn(question), dtype=np.float32)
+        except Exception as e:
+            print(f"답변 캐시 embedding 실패: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _check_corpus_version(self):
+        # FAQ 코퍼스가 다시 적재되었으면 기존 답변은 모두 폐기
+        version = read_corpus_version(self._collection_name)
+        if version != self._corpus_version:
+            self._entries.clear()
+            self._corpus_version = version
+            self.invalidations += 1
+
+    def _evict_expired(self, now):
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, question):
+        # (캐시된 답변 또는 None, 질문 벡터) 반환 - 벡터는 put에 넘겨 재계산을 피함
+        started = time.perf_counter()
+        key = normalize_question(question)
+
+        with self._lock:
+            self._check_corpus_version()
+            now = time.time()
+            self._evict_expired(now)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.lookup_seconds += time.perf_counter() - started
+                return entry.answer, entry.vector
+
+        vector = self._embed(question)
+
+        with self._lock:
+            if vector is not None:
+                keys = [k for k, entry in self._entries.items() if entry.vector is not None]
+                if keys:
+                    matrix = np.stack([self._entries[k].vector for k in keys])
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self._similarity_threshold:
+                        self._entries.move_to_end(keys[best])
+                        self.semantic_hits += 1
+                        self.lookup_seconds += time.perf_counter() - started
+                        return self._entries[keys[best]].answer, vector
+
+            self.misses += 1
+            self.lookup_seconds += time.perf_counter() - started
+            return None, vector
+
+    def get(self, question):
+        return self.lookup(question)[0]
+
+    def put(self, question, answer, vector=None):
+        key = normalize_question(question)
+        if vector is None:
+            vector = self._embed(question)
+
+        with self._lock:
+            self._entries[key] = _Entry(answer, vector, time.time() + self._ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+                "avg_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0
+            }
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+from chatbot.chatbot_answer import call_chatbot, acall_chatbot, should_cache_reply, COLLECTION_NAME, CHATBOT_FALLBACK_MESSAGE
+from common import clova_tracing as tracing
+
+# .env 파일 로드
+load_dotenv()
+
+# 라우팅 기준 : 어휘 검색 1위 chunk가 질문 토큰(idf 가중)을 포함하는 비율(coverage)
+#   ROUTER-RAG-COVERAGE 이상이면 chatbot을 거치지 않고 rag로 답변
+#   ROUTER-CHATBOT-COVERAGE 미만이면 문서에서 찾기 어려운 질문이므로 chatbot으로 답변
+#   그 사이면 chatbot과 rag를 동시에 호출하고 먼저 도착한 정상 답변 사용
+ROUTER_RAG_COVERAGE = float(os.getenv("ROUTER-RAG-COVERAGE", "0.8"))
+ROUTER_CHATBOT_COVERAGE = float(os.getenv("ROUTER-CHATBOT-COVERAGE", "0.4"))
+
+# 라우팅 결정 / 답변 지연 시간을 한 줄씩 기록할 JSONL 파일 (비어 있으면 기록하지 않음, 임계값 조정용)
+ROUTER_LOG_PATH = os.getenv("ROUTER-LOG-PATH", "")
+
+_both_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="answer-router")
+_log_lock = threading.Lock()
+
+
+def _silent(*args):
+    # 동시 호출 중인 chatbot의 진행 상황은 출력하지 않음
+    pass
+
+
+# ---------------------------
+# 라우팅 결정 : 어휘(BM25) 인덱스만 사용하므로 embedding / chatbot API 호출 없이 수 ms 안에 결정
+# ---------------------------
+def route_question(user_message, collection_name=COLLECTION_NAME):
+    import rag.clova_rag_module as rag
+    from rag.clova_lexical_index import load_lexical_index
+
+    started = time.perf_counter()
+    coverage, top_score = None, 0.0
+    lexical_index = load_lexical_index(rag.lexical_index_dir(collection_name))
+    if lexical_index is None:
+        # 적재된 문서가 없으면 rag로 답변할 수 없음
+        route = "chatbot"
+    else:
+        hits, detail = lexical_index.search(user_message, 1)
+        coverage = lexical_index.coverage(detail)
+        top_score = hits[0].distance if hits else 0.0
+        if coverage >= ROUTER_RAG_COVERAGE:
+            route = "rag"
+        elif coverage < ROUTER_CHATBOT_COVERAGE:
+            route = "chatbot"
+        else:
+            route = "both"
+    tracing.record_span("router.score", started)
+
+    return {
+        "route": route,
+        "coverage": coverage,
+        "top_score": top_score,
+        "score_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def log_route(user_message, decision, answered_by, reply, started):
+    # started : time.perf_counter() 값 (라우팅 시작 시점)
+    tracing.record_span(f"router.{decision['route']}", started)
+    if not ROUTER_LOG_PATH:
+        return
+    record = dict(
+        decision,
+        question=user_message,
+        answered_by=answered_by,
+        answered=should_cache_reply(reply),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        logged_at=time.time()
+    )
+    with _log_lock, open(ROUTER_LOG_PATH, "a") as log_file:
+        log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _pick_reply(answered_by, reply, fallback):
+    # 정상 답변이면 (답변, None), 아니면 (None, 첫 번째 실패 답변)
+    if should_cache_reply(reply):
+        return (answered_by, reply), None
+    return None, fallback or (answered_by, reply)
+
+
+# ---------------------------
+# chatbot + rag 동시 호출 : 먼저 도착한 정상 답변 사용, 둘 다 실패하면 먼저 도착한 실패 답변
+# ---------------------------
+def call_both(user_message, collection_name=COLLECTION_NAME):
+    import rag.clova_rag_module as rag
+
+    futures = {
+        _both_pool.submit(contextvars.copy_context().run, call_chatbot, user_message, _silent): "chatbot",
+        _both_pool.submit(contextvars.copy_context().run, rag.chat_with_rag, user_message, collection_name): "rag"
+    }
+    fallback = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                print(f"{futures[future]} 답변 실패: {user_message}: {future.exception()}")
+                continue
+            answered, fallback = _pick_reply(futures[future], future.result(), fallback)
+            if answered is not None:
+                # 늦게 끝나는 쪽은 기다리지 않음 (스레드는 백그라운드에서 마저 끝남)
+                return answered
+    return fallback or ("chatbot", CHATBOT_FALLBACK_MESSAGE)
+
+
+async def acall_both(user_message, collection_name=COLLECTION_NAME):
+    import rag.clova_rag_module as rag
+
+    tasks = {
+        asyncio.create_task(acall_chatbot(user_message, _silent)): "chatbot",
+        asyncio.create_task(rag.achat_with_rag(user_message, collection_name)): "rag"
+    }
+    fallback = None
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    print(f"{tasks[task]} 답변 실패: {user_message}: {task.exception()}")
+                    continue
+                answered, fallback = _pick_reply(tasks[task], task.result(), fallback)
+                if answered is not None:
+                    return answered
+        return fallback or ("chatbot", CHATBOT_FALLBACK_MESSAGE)
+    finally:
+        # 늦게 끝나는 쪽의 요청은 취소
+        for task in pending:
+            task.cancel()
+
+
+# ---------------------------
+# 라우팅 후 답변 : decision을 넘기면 라우팅을 다시 계산하지 않음 (스트리밍 경로에서 route만 먼저 확인할 때)
+# ---------------------------
+def call_routed(user_message, collection_name=COLLECTION_NAME, notify=print, decision=None):
+    started = time.perf_counter()
+    decision = decision or route_question(user_message, collection_name)
+
+    if decision["route"] == "rag":
+        import rag.clova_rag_module as rag
+        answered_by, reply = "rag", rag.chat_with_rag(user_message, collection_name)
+    elif decision["route"] == "chatbot":
+        answered_by, reply = "chatbot", call_chatbot(user_message, notify)
+    else:
+        answered_by, reply = call_both(user_message, collection_name)
+
+    log_route(user_message, decision, answered_by, reply, started)
+    return reply
+
+
+async def acall_routed(user_message, collection_name=COLLECTION_NAME, notify=print, decision=None):
+    started = time.perf_counter()
+    decision = decision or route_question(user_message, collection_name)
+
+    if decision["route"] == "rag":
+        import rag.clova_rag_module as rag
+        answered_by, reply = "rag", await rag.achat_with_rag(user_message, collection_name)
+    elif decision["route"] == "chatbot":
+        answered_by, reply = "chatbot", await acall_chatbot(user_message, notify)
+    else:
+        answered_by, reply = await acall_both(user_message, collection_name)
+
+    log_route(user_message, decision, answered_by, reply, started)
+    return reply
@@ -5,8 +5,14 @@ import hashlib
 import hmac
 import base64
 import time
-import requests
 import json
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from common.clova_http_client import get_session
+from common.clova_async_http_client import get_async_client
+from common import clova_tracing as tracing
 
 # .env 파일 로드
 load_dotenv()
@@ -15,6 +21,13 @@ load_dotenv()
 CLOVA_CHATBOT_URL = os.getenv("CLOVA-CHATBOT-URL")
 SECRET_KEY = os.getenv("SECRET-KEY")
 
+# 여러 질문 동시 요청 설정 : 동시 요청 수 / 질문별 제한 시간(초) / 전체 제한 시간(초)
+CHATBOT_FANOUT_WORKERS = int(os.getenv("CHATBOT-FANOUT-WORKERS", "8"))
+CHATBOT_REQUEST_TIMEOUT = float(os.getenv("CHATBOT-REQUEST-TIMEOUT", "10"))
+CHATBOT_FANOUT_BUDGET = float(os.getenv("CHATBOT-FANOUT-BUDGET", "15"))
+
+_fanout_pool = ThreadPoolExecutor(max_workers=CHATBOT_FANOUT_WORKERS, thread_name_prefix="chatbot-fanout")
+
 
 class ChatbotMessageSender:
 
@@ -23,7 +36,7 @@ class ChatbotMessageSender:
     # chatbot custom secret key
     secret_key = SECRET_KEY
 
-    def req_message_send(self, message):
+    def build_request(self, message):
 
         timestamp = self.get_timestamp()
         request_body = {
@@ -55,11 +68,44 @@ class ChatbotMessageSender:
         # print("## headers ", custom_headers)
         # print("## Request Body : ", json_request_body)
 
+        return custom_headers, json_request_body
+
+    def req_message_send(self, message, timeout=None):
+        custom_headers, json_request_body = self.build_request(message)
+
         ## POST Request
-        response = requests.post(headers=custom_headers, url=self.ep_path, data=json_request_body)
+        with tracing.span("chatbot.request"):
+            response = get_session().post(headers=custom_headers, url=self.ep_path, data=json_request_body, timeout=timeout)
 
         return response
 
+    def req_message_reply(self, message, timeout=None):
+        res = self.req_message_send(message, timeout=timeout)
+        return res.json()['content'][0]['data']['details']
+
+    def req_messages_reply_parallel(self, messages, request_timeout=CHATBOT_REQUEST_TIMEOUT, total_budget=CHATBOT_FANOUT_BUDGET):
+        # 질문들을 동시에 보내고, 질문 순서대로 답변 반환 (제한 시간 내에 받지 못한 답변은 None)
+        # 요청별 소요 시간이 호출한 쪽 trace에 기록되도록 context를 복사해서 실행
+        futures = [
+            _fanout_pool.submit(contextvars.copy_context().run, self.req_message_reply, message, request_timeout)
+            for message in messages
+        ]
+        done, _ = wait(futures, timeout=total_budget)
+
+        replies = []
+        for message, future in zip(messages, futures):
+            if future not in done:
+                future.cancel()
+                print(f"Chatbot 응답 시간 초과: {message}")
+                replies.append(None)
+            elif future.exception() is not None:
+                print(f"Chatbot 요청 실패: {message}: {future.exception()}")
+                replies.append(None)
+            else:
+                replies.append(future.result())
+
+        return replies
+
     @staticmethod
     def get_timestamp():
         timestamp = int(time.time() * 1000)
@@ -76,6 +122,49 @@ class ChatbotMessageSender:
         return signing_key
 
 
+# asyncio 버전 : 질문마다 스레드를 점유하지 않고 하나의 이벤트 루프에서 동시에 요청
+class AsyncChatbotMessageSender(ChatbotMessageSender):
+
+    async def req_message_send(self, message, timeout=None):
+        custom_headers, json_request_body = self.build_request(message)
+
+        ## POST Request
+        client = get_async_client()
+        with tracing.span("chatbot.request"):
+            response = await client.post(
+                self.ep_path, headers=custom_headers, content=json_request_body,
+                timeout=timeout if timeout is not None else client.timeout
+            )
+
+        return response
+
+    async def req_message_reply(self, message, timeout=None):
+        res = await self.req_message_send(message, timeout=timeout)
+        return res.json()['content'][0]['data']['details']
+
+    async def req_messages_reply_parallel(self, messages, request_timeout=CHATBOT_REQUEST_TIMEOUT, total_budget=CHATBOT_FANOUT_BUDGET):
+        # 질문들을 동시에 보내고, 질문 순서대로 답변 반환 (제한 시간 내에 받지 못한 답변은 None)
+        tasks = [asyncio.ensure_future(self.req_message_reply(message, request_timeout)) for message in messages]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=total_budget)
+        for task in pending:
+            task.cancel()
+
+        replies = []
+        for message, task in zip(messages, tasks):
+            if task not in done:
+                print(f"Chatbot 응답 시간 초과: {message}")
+                replies.append(None)
+            elif task.exception() is not None:
+                print(f"Chatbot 요청 실패: {message}: {task.exception()}")
+                replies.append(None)
+            else:
+                replies.append(task.result())
+
+        return replies
+
+
 # if __name__ == '__main__':
 
 #     message = "상금이 얼마인가요?"
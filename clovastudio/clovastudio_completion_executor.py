@@ -1,9 +1,15 @@
 import os
 from dotenv import load_dotenv
 
-import json
-import requests
 import re
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+
+from common.clova_http_client import get_session, base_url, CLOVASTUDIO_HOST
+from common.clova_async_http_client import get_async_client, drop_empty_headers
+from common.clova_sse import CompletionStream
+from common.clova_question_text import normalize_question
 
 # .env 파일 로드
 load_dotenv()
@@ -15,14 +21,17 @@ REQUEST_ID_FOR_COMPLETION = os.getenv("X-NCP-CLOVASTUDIO-REQUEST-ID-FOR-COMPLETI
 
 
 class CompletionExecutor:
+    # 단계별 소요 시간 기록 이름 (ttfb : 응답 헤더 / ttft : 첫 토큰 / total : 전체)
+    trace_name = "refine.completion"
+
     def __init__(self, host, api_key, api_key_primary_val, request_id):
         self._host = host
         self._api_key = api_key
         self._api_key_primary_val = api_key_primary_val
         self._request_id = request_id
 
-    def execute(self, completion_request):
-        headers = {
+    def _headers(self):
+        return {
             'X-NCP-CLOVASTUDIO-API-KEY': self._api_key,
             'X-NCP-APIGW-API-KEY': self._api_key_primary_val,
             'X-NCP-CLOVASTUDIO-REQUEST-ID': self._request_id,
@@ -30,61 +39,190 @@ class CompletionExecutor:
             'Accept': 'text/event-stream'
         }
 
-        with requests.post(
-            self._host + '/testapp/v1/chat-completions/HCX-003',
-            headers=headers, 
+    @property
+    def url(self):
+        return base_url(self._host) + '/testapp/v1/chat-completions/HCX-003'
+
+    def _post(self, completion_request):
+        return get_session().post(
+            self.url,
+            headers=self._headers(), 
             json=completion_request, 
             stream=True
-        ) as r:
-            longest_line = ""
-            for line in r.iter_lines():
-                if line:
-                    decoded_line = line.decode("utf-8")
-                    if decoded_line.startswith("data:"):
-                        event_data = json.loads(decoded_line[len("data:"):])
-                        message_content = event_data.get("message", {}).get("content", "")
-                        if len(message_content) > len(longest_line):
-                            longest_line = message_content
-            final_answer = longest_line
-        
-        return final_answer
-    
+        )
 
-def sentence_refine(request_text):
-    completion_executor = CompletionExecutor(
-        host='https://clovastudio.stream.ntruss.com',
+    def execute(self, completion_request):
+        return self.complete(completion_request).content
+
+    def stream(self, completion_request, completion=None):
+        # SSE 'token' 이벤트가 도착하는 대로 토큰을 하나씩 반환 ('result' 이벤트를 받으면 바로 연결 종료)
+        completion = completion or CompletionStream(self.trace_name)
+        try:
+            with self._post(completion_request) as r:
+                completion.opened(r.status_code, None if r.status_code == 200 else r.content)
+                yield from completion.consume(r.iter_content(chunk_size=None))
+        finally:
+            completion.finish()
+
+    def complete(self, completion_request):
+        # 전체 답변 + 토큰 사용량(input_length / output_length)이 담긴 CompletionStream 반환
+        completion = CompletionStream(self.trace_name)
+        for _ in self.stream(completion_request, completion):
+            pass
+        return completion
+
+
+# asyncio 버전 : 문장 교정을 기다리는 동안 이벤트 루프가 다른 요청을 처리
+class AsyncCompletionExecutor(CompletionExecutor):
+    async def stream(self, completion_request, completion=None):
+        completion = completion or CompletionStream(self.trace_name)
+        try:
+            async with get_async_client().stream("POST", self.url, headers=drop_empty_headers(self._headers()), json=completion_request) as r:
+                completion.opened(r.status_code, None if r.status_code == 200 else await r.aread())
+                async for token in completion.aconsume(r.aiter_bytes()):
+                    yield token
+        finally:
+            completion.finish()
+
+    async def complete(self, completion_request):
+        completion = CompletionStream(self.trace_name)
+        async for _ in self.stream(completion_request, completion):
+            pass
+        return completion
+
+    async def execute(self, completion_request):
+        return (await self.complete(completion_request)).content
+
+
+# ---------------------------
+# 문장 교정 : 여러 질문이 섞인 문장을 한 문장에 한 질문씩 분리 + 맞춤법 교정
+#   LLM 결과는 정규화된 입력별로 캐시
+# ---------------------------
+REFINE_PRESET = (
+    {"role":"system","content":"[작업]\n- 맞춤법 교정을 교정해줘\n- 문장의 주술 구조 교정, 문법 교정 등 문장 교정을 해줘\n- 만약 한 문장에 여러 질문이 섞여있으면 내용상 중복을 제거하고 한 문장에 한 질문만 들어가도록 분리해줘\n- 질문에 없는 문장을 추가하면 절대 안돼\n\n[결과물]\n- 한 문장에 한 질문만 들어가도록 하고 문장 교정을 맞춘 결과 문장이 총 몇 개인지\n- 결과 문장은 무엇인지 아래 형식으로 출력해줘\n\"\"\"\n질문 수 : []개\n질문 : []//[]//[]\n\"\"\""},
+    {"role":"user","content":"중간산출물은 day5 자정까지만 제출하면 되는 건가요?"},
+    {"role":"assistant","content":"질문 수 : 1개\n질문 : 중간산출물은 day5 자정까지만 제출하면 되는 건가요?"},
+    {"role":"user","content":"팀 빌딩은 언제까지 하고 한 팀 당 최대 인원은 몇 명인가요?"},
+    {"role":"assistant","content":"질문 수 : 2개\n질문 : 팀 빌딩은 언제까지 하나요? \n질문 : 한 팀 당 최대 인원은 몇 명인가요?"}
+)
+
+REFINE_PARAMETERS = {
+    'topP': 0.8,
+    'topK': 0,
+    'maxTokens': 256,
+    'temperature': 0.5,
+    'repeatPenalty': 5.0,
+    'stopBefore': [],
+    'includeAiFilters': True,
+    'seed': 0
+}
+
+# 교정 결과 캐시 항목 수
+REFINE_CACHE_MAX_ENTRIES = int(os.getenv("REFINE-CACHE-MAX-ENTRIES", "1000"))
+
+def build_refine_request(request_text):
+    return dict(REFINE_PARAMETERS, messages=[*REFINE_PRESET, {"role":"user","content":request_text}])
+
+
+def parse_refine_response(response_data, request_text):
+    # '질문 : A//B' 또는 '질문 :' 여러 줄 모두 허용, 질문을 하나도 찾지 못하면 원래 질문 사용
+    questions = []
+    for line in re.findall(r'질문\s*:\s*(.+)', response_data or ""):
+        for question in line.split("//"):
+            question = question.strip().strip('[]"').strip()
+            if question:
+                questions.append(question)
+    questions = list(dict.fromkeys(questions)) or [request_text]
+
+    return len(questions), questions
+
+
+@lru_cache(maxsize=1)
+def get_refine_executor():
+    return CompletionExecutor(
+        host=CLOVASTUDIO_HOST,
+        api_key = API_KEY,
+        api_key_primary_val = APIGW_API_KEY,
+        request_id = REQUEST_ID_FOR_COMPLETION
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_refine_executor():
+    return AsyncCompletionExecutor(
+        host=CLOVASTUDIO_HOST,
         api_key = API_KEY,
         api_key_primary_val = APIGW_API_KEY,
         request_id = REQUEST_ID_FOR_COMPLETION
     )
 
-    preset_text = [
-        {"role":"system","content":"[작업]\n- 맞춤법 교정을 교정해줘\n- 문장의 주술 구조 교정, 문법 교정 등 문장 교정을 해줘\n- 만약 한 문장에 여러 질문이 섞여있으면 내용상 중복을 제거하고 한 문장에 한 질문만 들어가도록 분리해줘\n- 질문에 없는 문장을 추가하면 절대 안돼\n\n[결과물]\n- 한 문장에 한 질문만 들어가도록 하고 문장 교정을 맞춘 결과 문장이 총 몇 개인지\n- 결과 문장은 무엇인지 아래 형식으로 출력해줘\n\"\"\"\n질문 수 : []개\n질문 : []//[]//[]\n\"\"\""},
-        {"role":"user","content":"중간산출물은 day5 자정까지만 제출하면 되는 건가요?"},
-        {"role":"assistant","content":"질문 수 : 1개\n질문 : 중간산출물은 day5 자정까지만 제출하면 되는 건가요?"},
-        {"role":"user","content":"팀 빌딩은 언제까지 하고 한 팀 당 최대 인원은 몇 명인가요?"},
-        {"role":"assistant","content":"질문 수 : 2개\n질문 : 팀 빌딩은 언제까지 하나요? \n질문 : 한 팀 당 최대 인원은 몇 명인가요?"},
-        {"role":"user","content":request_text}
-    ]
-
-    request_data = {
-        'messages': preset_text,
-        'topP': 0.8,
-        'topK': 0,
-        'maxTokens': 256,
-        'temperature': 0.5,
-        'repeatPenalty': 5.0,
-        'stopBefore': [],
-        'includeAiFilters': True,
-        'seed': 0
-    }
-
-    response_data = completion_executor.execute(request_data)
-
-    # 질문 수 추출 (정규 표현식을 사용하여 숫자 추출)
-    question_count = int(re.search(r'질문 수\s*:\s*(\d+)', response_data).group(1))
-
-    # 질문들 추출 (정규 표현식으로 '질문 :' 뒤에 나오는 텍스트들 추출)
-    questions = re.findall(r'질문\s*:\s*(.+)', response_data)
-
-    return question_count, questions
\ No newline at end of file
+
+# 교정 결과 캐시 (LRU) + 경로별 처리 수 (cached : 캐시 / llm : HCX-003 호출)
+_refine_cache = OrderedDict()
+_refine_lock = threading.Lock()
+_refine_counts = {"cached": 0, "llm": 0, "failed": 0}
+
+
+def _count(path):
+    with _refine_lock:
+        _refine_counts[path] += 1
+
+
+def refine_stats():
+    with _refine_lock:
+        return dict(_refine_counts, cache_entries=len(_refine_cache))
+
+
+def _lookup_refine(request_text):
+    # 캐시에 있으면 (질문 수, 질문 목록), 아니면 None
+    key = normalize_question(request_text)
+    with _refine_lock:
+        cached = _refine_cache.get(key)
+        if cached is not None:
+            _refine_cache.move_to_end(key)
+            _refine_counts["cached"] += 1
+            return cached[0], list(cached[1])
+    return None
+
+
+def _store_refine(request_text, result):
+    with _refine_lock:
+        _refine_cache[normalize_question(request_text)] = (result[0], tuple(result[1]))
+        while len(_refine_cache) > REFINE_CACHE_MAX_ENTRIES:
+            _refine_cache.popitem(last=False)
+        _refine_counts["llm"] += 1
+
+
+def sentence_refine(request_text):
+    result = _lookup_refine(request_text)
+    if result is not None:
+        return result
+
+    try:
+        response_data = get_refine_executor().execute(build_refine_request(request_text))
+    except Exception as e:
+        # 교정에 실패하면 원래 질문으로 진행 (캐시하지 않음)
+        print(f"문장 교정 실패: {request_text}: {e}")
+        _count("failed")
+        return 1, [request_text]
+
+    result = parse_refine_response(response_data, request_text)
+    _store_refine(request_text, result)
+    return result
+
+
+async def asentence_refine(request_text):
+    result = _lookup_refine(request_text)
+    if result is not None:
+        return result
+
+    try:
+        response_data = await get_async_refine_executor().execute(build_refine_request(request_text))
+    except Exception as e:
+        print(f"문장 교정 실패: {request_text}: {e}")
+        _count("failed")
+        return 1, [request_text]
+
+    result = parse_refine_response(response_data, request_text)
+    _store_refine(request_text, result)
+    return result
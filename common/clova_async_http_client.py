@@ -0,0 +1,40 @@
+import asyncio
+import weakref
+
+from common.clova_http_client import HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+
+# ---------------------------
+# 비동기 공용 클라이언트 : 이벤트 루프마다 keep-alive 연결을 공유하는 httpx.AsyncClient 하나
+# ---------------------------
+_clients = weakref.WeakKeyDictionary()
+
+
+def create_async_client(pool_maxsize=HTTP_POOL_MAXSIZE, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT):
+    # httpx는 asyncio 경로(API 서버, 배치)에서만 사용하므로 Streamlit 앱 시작 시에는 로드하지 않음
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_maxsize * 4, max_keepalive_connections=pool_maxsize),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+    )
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = create_async_client()
+        _clients[loop] = client
+    return client
+
+
+def drop_empty_headers(headers):
+    # requests와 같이 값이 None인 header는 보내지 않음 (httpx는 None 값을 허용하지 않음)
+    return {key: value for key, value in headers.items() if value is not None}
+
+
+async def close_async_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
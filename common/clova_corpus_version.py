@@ -0,0 +1,28 @@
+import os
+import uuid
+from pathlib import Path
+from dotenv import load_dotenv
+
+# .env 파일 로드
+load_dotenv()
+
+# RAG 관련 캐시/상태 파일 저장 위치
+RAG_CACHE_DIR = os.getenv("RAG-CACHE-DIR", ".rag_cache")
+
+# 컬렉션이 다시 적재될 때마다 바뀌는 버전 (답변 캐시 무효화에 사용)
+#   컬렉션별 파일 : 평가용 컬렉션을 적재해도 서비스 컬렉션의 답변 캐시는 유지
+CORPUS_VERSION_DIR = Path(RAG_CACHE_DIR) / "corpus_versions"
+
+
+def read_corpus_version(collection_name):
+    try:
+        return (CORPUS_VERSION_DIR / collection_name).read_text().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_corpus_version(collection_name):
+    version = uuid.uuid4().hex
+    CORPUS_VERSION_DIR.mkdir(parents=True, exist_ok=True)
+    (CORPUS_VERSION_DIR / collection_name).write_text(version)
+    return version
@@ -0,0 +1,146 @@
+import os
+import threading
+from collections import defaultdict
+from dotenv import load_dotenv
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# .env 파일 로드
+load_dotenv()
+
+# 커넥션 풀 설정 : host 수 / host당 keep-alive 연결 수 / 타임아웃(초)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP-POOL-CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP-POOL-MAXSIZE", "16"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP-CONNECT-TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP-READ-TIMEOUT", "60"))
+
+# CLOVA Studio host : chat completions(stream) / api-tools(segmentation, embedding)
+#   로컬 stub 서버로 부하 테스트할 때 변경 (예: http://127.0.0.1:8080)
+CLOVASTUDIO_HOST = os.getenv("CLOVASTUDIO-HOST", "https://clovastudio.stream.ntruss.com")
+CLOVASTUDIO_APIGW_HOST = os.getenv("CLOVASTUDIO-APIGW-HOST", "clovastudio.apigw.ntruss.com")
+
+# 재시도 대상 HTTP 상태 코드 (rate limit, 서버 오류)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ClovaAPIError(ValueError):
+    def __init__(self, status, code, message):
+        super().__init__(f"오류 발생: {code}: {message}")
+        self.status = status
+        self.code = code
+
+    @property
+    def retryable(self):
+        return self.status in RETRYABLE_STATUS or str(self.code).startswith(('429', '5'))
+
+
+# ---------------------------
+# 연결 재사용 지표
+# ---------------------------
+_stats_lock = threading.Lock()
+_request_counts = defaultdict(int)
+_new_connection_counts = defaultdict(int)
+
+
+def _record_request(host):
+    with _stats_lock:
+        _request_counts[host] += 1
+
+
+def _record_new_connection(host):
+    with _stats_lock:
+        _new_connection_counts[host] += 1
+
+
+def connection_stats():
+    with _stats_lock:
+        per_host = {}
+        for host in set(_request_counts) | set(_new_connection_counts):
+            requests_sent = _request_counts[host]
+            new_connections = _new_connection_counts[host]
+            per_host[host] = {
+                "requests": requests_sent,
+                "new_connections": new_connections,
+                "reused": max(0, requests_sent - new_connections)
+            }
+
+    total_requests = sum(item["requests"] for item in per_host.values())
+    total_new = sum(item["new_connections"] for item in per_host.values())
+    return {
+        "requests": total_requests,
+        "new_connections": total_new,
+        "reused": max(0, total_requests - total_new),
+        "reuse_ratio": (total_requests - total_new) / total_requests if total_requests else 0.0,
+        "per_host": per_host
+    }
+
+
+# 새 TCP(+TLS) 연결이 만들어질 때마다 집계하는 커넥션 풀
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _record_new_connection(self.host)
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _record_new_connection(self.host)
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, timeout, **kwargs):
+        self._timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self._timeout
+        _record_request(requests.utils.urlparse(request.url).hostname)
+        return super().send(request, **kwargs)
+
+
+# ---------------------------
+# 공용 세션 : 모든 CLOVA executor / chatbot이 host별 keep-alive 연결을 공유
+# ---------------------------
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                   connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT):
+    adapter = _PooledAdapter(
+        timeout=(connect_timeout, read_timeout),
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=False
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def base_url(host):
+    # scheme 없이 host만 주어지면 https로 간주
+    if host.startswith(("http://", "https://")):
+        return host.rstrip("/")
+    return "https://" + host.rstrip("/")
@@ -0,0 +1,12 @@
+import re
+import unicodedata
+
+
+# ---------------------------
+# 질문 정규화 : 답변 캐시 / 문장 교정 캐시 / single-flight 키로 사용
+# ---------------------------
+def normalize_question(question):
+    # 전각/반각, 대소문자, 공백, 문장 끝 부호 차이는 같은 질문으로 취급
+    question = unicodedata.normalize("NFKC", question).lower()
+    question = re.sub(r"\s+", " ", question).strip()
+    return re.sub(r"[\s?!.~,]+$", "", question)
@@ -0,0 +1,98 @@
+import asyncio
+
+
+# ---------------------------
+# 스트림 공유 : 한 번 실행한 async generator의 결과를 여러 구독자에게 순서대로 전달
+#   늦게 들어온 구독자는 이미 받은 항목부터 다시 받음
+# ---------------------------
+class _Broadcast:
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, agen):
+        try:
+            async for item in agen:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.items) > position or self.done)
+                items = self.items[position:]
+                done = self.done
+
+            for item in items:
+                yield item
+            position += len(items)
+
+            if done and position >= len(self.items):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+# ---------------------------
+# Single-flight : 같은 key의 요청이 진행 중이면 새로 호출하지 않고 진행 중인 결과를 함께 사용
+# ---------------------------
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self.leaders = 0
+        self.followers = 0
+
+    @property
+    def inflight(self):
+        return len(self._calls) + len(self._streams)
+
+    async def do(self, key, func):
+        # func : 인자 없는 coroutine 함수 -> (결과, 다른 요청과 합쳐졌는지 여부)
+        task = self._calls.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # 요청한 클라이언트가 연결을 끊어도 함께 기다리는 요청을 위해 upstream 호출은 계속 진행
+        return await asyncio.shield(task), coalesced
+
+    def stream(self, key, func):
+        # func : 인자 없는 async generator 함수 -> (항목 async iterator, 다른 요청과 합쳐졌는지 여부)
+        broadcast = self._streams.get(key)
+        coalesced = broadcast is not None
+        if coalesced:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            task = asyncio.ensure_future(broadcast.publish(func()))
+            task.add_done_callback(lambda _: self._streams.pop(key, None))
+
+        return broadcast.subscribe(), coalesced
+
+    def stats(self):
+        calls = self.leaders + self.followers
+        return {
+            "calls": calls,
+            "upstream_calls": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_ratio": self.followers / calls if calls else 0.0,
+            "inflight": self.inflight
+        }
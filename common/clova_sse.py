@@ -0,0 +1,167 @@
+import time
+
+import orjson
+
+from common.clova_http_client import ClovaAPIError
+from common import clova_tracing as tracing
+
+# chat completions 스트림을 끝내는 이벤트 : 'result'(최종 답변 + 토큰 사용량) / 'error'
+TERMINAL_EVENTS = {"result", "error"}
+
+
+# ---------------------------
+# SSE 파서 : bytes 조각을 받는 대로 이벤트 단위로 잘라 (event, data) 반환
+#   CLOVA Studio 형식 : "id: ...\nevent: token|result|error|signal\ndata: {json}\n\n"
+#   JSON으로 읽을 수 없거나 JSON 객체가 아닌 data는 건너뛰고 malformed 수만 집계
+# ---------------------------
+class SSEParser:
+    def __init__(self):
+        self._buffer = b""
+        self._event = None
+        self._data = []
+        self.malformed = 0
+
+    def feed(self, chunk):
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        events = []
+        for line in lines:
+            event = self._line(line.rstrip(b"\r"))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self):
+        # 마지막 빈 줄 없이 끝난 스트림의 남은 이벤트 처리
+        events = self.feed(b"\n\n") if self._buffer or self._data else []
+        self._buffer = b""
+        return events
+
+    def _line(self, line):
+        if not line:
+            return self._dispatch()
+        if line.startswith(b":"):
+            return None
+        field, _, value = line.partition(b":")
+        if value.startswith(b" "):
+            value = value[1:]
+        if field == b"event":
+            self._event = value.decode("utf-8", errors="replace")
+        elif field == b"data":
+            self._data.append(value)
+        return None
+
+    def _dispatch(self):
+        event, data = self._event or "message", self._data
+        self._event, self._data = None, []
+        if not data:
+            return None
+        try:
+            payload = orjson.loads(b"\n".join(data))
+        except orjson.JSONDecodeError:
+            payload = None
+        if not isinstance(payload, dict):
+            self.malformed += 1
+            return None
+        return event, payload
+
+
+def raise_for_status(status, body):
+    # 스트림이 열리기 전에 실패한 요청 (인증 오류, rate limit 등)
+    try:
+        error = orjson.loads(body).get("status", {})
+    except (orjson.JSONDecodeError, AttributeError):
+        error = {}
+    raise ClovaAPIError(status, error.get("code", status), error.get("message", "Unknown error"))
+
+
+# ---------------------------
+# completion 스트림 : 토큰 / 최종 결과 / 토큰 사용량 누적 + 단계별 소요 시간 기록
+#   ttfb : 응답 헤더 / ttft : 첫 토큰 / total : 전체
+#   'result' 또는 'error' 이벤트를 받으면 남은 스트림을 읽지 않고 종료
+# ---------------------------
+class CompletionStream:
+    def __init__(self, trace_name):
+        self.trace_name = trace_name
+        self.started = time.perf_counter()
+        self.parser = SSEParser()
+        self.tokens = []
+        self.result = None
+        self._first_content = True
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    @property
+    def content(self):
+        # 최종 이벤트의 전체 답변, 최종 이벤트 없이 끊긴 경우 지금까지 받은 토큰
+        if self.result is not None:
+            return self.result.get("message", {}).get("content", "")
+        return "".join(self.tokens)
+
+    @property
+    def input_length(self):
+        return (self.result or {}).get("inputLength", 0)
+
+    @property
+    def output_length(self):
+        return (self.result or {}).get("outputLength", 0)
+
+    @property
+    def stop_reason(self):
+        return (self.result or {}).get("stopReason")
+
+    def opened(self, status, body=None):
+        tracing.record_span(self.trace_name + ".ttfb", self.started)
+        if status != 200:
+            raise_for_status(status, body)
+
+    def _mark_first_content(self):
+        if self._first_content:
+            tracing.record_span(self.trace_name + ".ttft", self.started)
+            self._first_content = False
+
+    def _handle(self, event, data):
+        if event == "token":
+            token = data.get("message", {}).get("content", "")
+            if token:
+                self._mark_first_content()
+                self.tokens.append(token)
+            return token
+        if event == "result":
+            self._mark_first_content()
+            self.result = data
+        elif event == "error":
+            error = data.get("status", {})
+            raise ClovaAPIError(200, error.get("code", "error"), error.get("message", "Unknown error"))
+        return None
+
+    def _events(self, chunk):
+        for event, data in self.parser.feed(chunk) if chunk is not None else self.parser.close():
+            token = self._handle(event, data)
+            if token:
+                yield token
+            if event in TERMINAL_EVENTS:
+                return
+
+    def consume(self, chunks):
+        for chunk in chunks:
+            yield from self._events(chunk)
+            if self.done:
+                return
+        yield from self._events(None)
+
+    async def aconsume(self, chunks):
+        async for chunk in chunks:
+            for token in self._events(chunk):
+                yield token
+            if self.done:
+                return
+        for token in self._events(None):
+            yield token
+
+    def finish(self):
+        tracing.record_span(self.trace_name + ".total", self.started)
+        if self.result is not None:
+            tracing.record_usage(self.trace_name, self.input_length, self.output_length)
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+# .env 파일 로드
+load_dotenv()
+
+# 추적 설정 : 완료된 trace를 한 줄씩 기록할 JSONL 파일 (비어 있으면 기록하지 않음) / 분위수 계산용 최근 샘플 수
+TRACE_LOG_PATH = os.getenv("TRACE-LOG-PATH", "")
+TRACE_RESERVOIR_SIZE = int(os.getenv("TRACE-RESERVOIR-SIZE", "2048"))
+
+# Prometheus histogram bucket 경계(초)
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ---------------------------
+# 단계별 소요 시간 histogram : 누적 bucket(Prometheus) + 최근 샘플(p50/p95/p99)
+# ---------------------------
+class Histogram:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS, reservoir_size=TRACE_RESERVOIR_SIZE):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self._recent = deque(maxlen=reservoir_size)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self._recent.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def percentile(self, q):
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+# 단계별 누적 토큰 사용량 {name: {"input": n, "output": n, "calls": n}}
+_usage = {}
+
+
+def observe(name, seconds):
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def stage_stats():
+    # 단계별 {count, mean_ms, p50_ms, p95_ms, p99_ms}
+    with _histograms_lock:
+        return {
+            name: {
+                "count": histogram.count,
+                "mean_ms": histogram.total / histogram.count * 1000 if histogram.count else 0.0,
+                "p50_ms": histogram.percentile(50) * 1000,
+                "p95_ms": histogram.percentile(95) * 1000,
+                "p99_ms": histogram.percentile(99) * 1000
+            }
+            for name, histogram in sorted(_histograms.items())
+        }
+
+
+def record_usage(name, input_tokens, output_tokens):
+    # completion 최종 이벤트의 inputLength / outputLength 집계 (비용 / 토큰당 지연 계산용)
+    with _histograms_lock:
+        usage = _usage.setdefault(name, {"input": 0, "output": 0, "calls": 0})
+        usage["input"] += input_tokens
+        usage["output"] += output_tokens
+        usage["calls"] += 1
+    active = _current_trace.get()
+    if active is not None:
+        active.add_usage(name, input_tokens, output_tokens)
+
+
+def usage_stats():
+    with _histograms_lock:
+        return {name: dict(usage) for name, usage in sorted(_usage.items())}
+
+
+def prometheus_text():
+    lines = [
+        "# HELP clova_stage_seconds Latency of each answer pipeline stage.",
+        "# TYPE clova_stage_seconds histogram"
+    ]
+    with _histograms_lock:
+        for name, histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                cumulative += count
+                lines.append(f'clova_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'clova_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'clova_stage_seconds_sum{{stage="{name}"}} {histogram.total}')
+            lines.append(f'clova_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+        if _usage:
+            lines.append("# HELP clova_completion_tokens_total Tokens reported by completion result events.")
+            lines.append("# TYPE clova_completion_tokens_total counter")
+            for name, usage in sorted(_usage.items()):
+                lines.append(f'clova_completion_tokens_total{{stage="{name}",kind="input"}} {usage["input"]}')
+                lines.append(f'clova_completion_tokens_total{{stage="{name}",kind="output"}} {usage["output"]}')
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Trace : 요청 하나의 단계별 span 목록 (contextvars로 전달되어 asyncio task / to_thread 안에서도 같은 trace에 기록)
+# ---------------------------
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.spans = []
+        self.usage = {}
+
+    def add(self, name, started, finished):
+        self.spans.append({
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 1),
+            "duration_ms": round((finished - started) * 1000, 1)
+        })
+
+    def add_usage(self, name, input_tokens, output_tokens):
+        usage = self.usage.setdefault(name, {"input": 0, "output": 0})
+        usage["input"] += input_tokens
+        usage["output"] += output_tokens
+
+    def breakdown(self):
+        breakdown = {
+            "name": self.name,
+            "elapsed_ms": round((self.elapsed or 0.0) * 1000, 1),
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"])
+        }
+        if self.usage:
+            breakdown["usage"] = self.usage
+        return breakdown
+
+
+_current_trace = ContextVar("clova_trace", default=None)
+_log_lock = threading.Lock()
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def _write_trace_log(finished_trace):
+    if not TRACE_LOG_PATH:
+        return
+    record = dict(finished_trace.breakdown(), started_at=finished_trace.started_at)
+    with _log_lock, open(TRACE_LOG_PATH, "a") as log_file:
+        log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def trace(name):
+    new_trace = Trace(name)
+    token = _current_trace.set(new_trace)
+    try:
+        yield new_trace
+    finally:
+        _current_trace.reset(token)
+        new_trace.elapsed = time.perf_counter() - new_trace.started
+        observe(name, new_trace.elapsed)
+        _write_trace_log(new_trace)
+
+
+def record_span(name, started, finished=None):
+    # started/finished : time.perf_counter() 값
+    finished = time.perf_counter() if finished is None else finished
+    observe(name, finished - started)
+    active = _current_trace.get()
+    if active is not None:
+        active.add(name, started, finished)
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, started)
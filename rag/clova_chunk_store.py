@@ -0,0 +1,295 @@
+import os
+import json
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+import numpy as np
+
+# .env 파일 로드
+load_dotenv()
+
+# embedding 저장 형식 : float32(기본) / float16 / int8(행별 scale, 원래 크기의 1/4)
+CHUNK_STORE_DTYPE = os.getenv("CHUNK-STORE-DTYPE", "float32")
+
+# 양자화 recall 점검 : 질의로 사용할 표본 chunk 수 / top-k
+CHUNK_STORE_RECALL_SAMPLE = int(os.getenv("CHUNK-STORE-RECALL-SAMPLE", "200"))
+CHUNK_STORE_RECALL_K = int(os.getenv("CHUNK-STORE-RECALL-K", "10"))
+# 양자화 저장 시 recall 점검 여부 (점검하는 동안만 원본 float32를 임시 파일로 보관)
+CHUNK_STORE_RECALL_CHECK = os.getenv("CHUNK-STORE-RECALL-CHECK", "true").lower() == "true"
+
+CHUNK_STORE_FORMAT = "chunk-store-v1"
+EMBEDDING_FILES = {"float32": ("embeddings.f32", np.float32), "float16": ("embeddings.f16", np.float16), "int8": ("embeddings.i8", np.int8)}
+
+# 양자화된 행렬은 이 행 수만큼씩 float32로 바꿔 내적 계산 (검색 중 메모리 사용량 제한)
+SCORE_BLOCK_ROWS = 16384
+
+
+# ---------------------------
+# 양자화 / 내적 계산
+# ---------------------------
+def quantize(vectors, dtype):
+    # (저장할 행렬, int8일 때 행별 scale 또는 None)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        # 행별 대칭 양자화 : 절댓값 최대가 127이 되도록 scale 계산
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"unknown chunk store dtype: {dtype}")
+
+
+def dequantize(stored, scales):
+    vectors = np.asarray(stored, dtype=np.float32)
+    return vectors * scales[:, None] if scales is not None else vectors
+
+
+def score_matrix(queries, stored, scales=None):
+    # (질문 수 x 차원) @ (차원 x chunk 수), 양자화된 행렬은 block 단위로 float32 변환
+    if stored.dtype == np.float32:
+        return queries @ stored.T
+    scores = np.empty((len(queries), len(stored)), dtype=np.float32)
+    for start in range(0, len(stored), SCORE_BLOCK_ROWS):
+        block = queries @ np.asarray(stored[start:start + SCORE_BLOCK_ROWS], dtype=np.float32).T
+        if scales is not None:
+            block *= scales[start:start + SCORE_BLOCK_ROWS]
+        scores[:, start:start + SCORE_BLOCK_ROWS] = block
+    return scores
+
+
+def top_k(scores, k):
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def quantization_recall(vectors, dtype, k=CHUNK_STORE_RECALL_K, sample=CHUNK_STORE_RECALL_SAMPLE, seed=0):
+    # 표본 chunk를 질의로 사용해 float32 exact top-k 대비 양자화 top-k가 같은 chunk를 찾는 비율
+    vectors = np.asarray(vectors, dtype=np.float32)
+    report = {"dtype": dtype, "k": min(k, len(vectors)), "queries": 0, "recall": 1.0}
+    if dtype == "float32" or not len(vectors):
+        return report
+
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+    stored, scales = quantize(vectors, dtype)
+    exact = top_k(score_matrix(queries, vectors), k)
+    approx = top_k(score_matrix(queries, stored, scales), k)
+
+    hits = sum(len(set(e.tolist()) & set(a.tolist())) for e, a in zip(exact, approx))
+    report.update({"queries": len(queries), "recall": hits / exact.size})
+    return report
+
+
+class _Column:
+    # chunk 번호로 값을 읽는 열 (list처럼 [i], len, 반복 지원)
+    def __init__(self, getter, length):
+        self._getter = getter
+        self._length = length
+
+    def __getitem__(self, i):
+        return self._getter(i)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return (self._getter(i) for i in range(self._length))
+
+
+# ---------------------------
+# 열(column) 단위 chunk 저장소 : <dir>/
+#   meta.json                      : {format, count, dim, dtype, text_bytes, quantization}
+#   chunk_ids.txt                  : 한 줄에 chunk id 하나
+#   sources.json + source_ids.u32  : 출처 URL은 한 번씩만 저장하고 chunk는 번호로 참조
+#   text.bin + text_offsets.u64    : 모든 본문을 이어 붙인 UTF-8 버퍼 + chunk별 시작 위치
+#   embeddings.{f32,f16,i8}        : (count x dim) 행렬, int8이면 scales.f32 (행별 scale)
+#   읽기는 모두 memory-map (프로세스 메모리로 복사하지 않음)
+#   양자화한 경우 원본 float32는 저장하지 않음 (recall 점검 / 재적재 시 원본은 embedding 캐시에서 다시 가져옴)
+# ---------------------------
+class ChunkStoreWriter:
+    def __init__(self, directory, dim, dtype=CHUNK_STORE_DTYPE, recall_check=CHUNK_STORE_RECALL_CHECK):
+        if dtype not in EMBEDDING_FILES:
+            raise ValueError(f"unknown chunk store dtype: {dtype}")
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._dim = dim
+        self._dtype = dtype
+        self._count = 0
+        self._text_bytes = 0
+        self._sources = {}
+        self._scales = []
+
+        self._ids_file = open(self._dir / "chunk_ids.txt", "w", encoding="utf-8")
+        self._source_ids_file = open(self._dir / "source_ids.u32", "wb")
+        self._text_file = open(self._dir / "text.bin", "wb")
+        self._offsets_file = open(self._dir / "text_offsets.u64", "wb")
+        self._offsets_file.write(np.uint64(0).tobytes())
+        self._vector_file = open(self._dir / EMBEDDING_FILES[dtype][0], "wb")
+        self._inexact = 0
+        # recall 점검용 원본 벡터 (점검 후 삭제)
+        self._original_path = self._dir / "recall_check.f32"
+        self._original_file = open(self._original_path, "wb") if recall_check and dtype != "float32" else None
+
+    def append(self, chunk_id, source, text, embedding, exact=True):
+        # exact=False : 원본을 구하지 못해 양자화 복원값을 다시 쓰는 행 (recall 점검 결과에 개수 표시)
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, self._dim)
+        stored, scales = quantize(vector, self._dtype)
+        self._vector_file.write(stored.tobytes())
+        if scales is not None:
+            self._scales.append(scales[0])
+        if self._original_file is not None:
+            self._original_file.write(vector.tobytes())
+        if not exact:
+            self._inexact += 1
+
+        source_id = self._sources.setdefault(source, len(self._sources))
+        self._source_ids_file.write(np.uint32(source_id).tobytes())
+
+        encoded = text.encode("utf-8")
+        self._text_file.write(encoded)
+        self._text_bytes += len(encoded)
+        self._offsets_file.write(np.uint64(self._text_bytes).tobytes())
+
+        self._ids_file.write(chunk_id + "\n")
+        self._count += 1
+
+    def close(self):
+        for open_file in (self._ids_file, self._source_ids_file, self._text_file, self._offsets_file, self._vector_file):
+            open_file.close()
+        if self._dtype == "int8":
+            np.asarray(self._scales, dtype=np.float32).tofile(self._dir / "scales.f32")
+        with open(self._dir / "sources.json", "w", encoding="utf-8") as sources_file:
+            json.dump(list(self._sources), sources_file, ensure_ascii=False)
+
+        quantization = None
+        if self._original_file is not None:
+            self._original_file.close()
+            originals = np.fromfile(self._original_path, dtype=np.float32).reshape(self._count, self._dim)
+            quantization = quantization_recall(originals, self._dtype)
+            if self._inexact:
+                quantization["inexact_rows"] = self._inexact
+            self._original_path.unlink()
+
+        meta = {
+            "format": CHUNK_STORE_FORMAT,
+            "count": self._count,
+            "dim": self._dim,
+            "dtype": self._dtype,
+            "sources": len(self._sources),
+            "text_bytes": self._text_bytes,
+            "quantization": quantization
+        }
+        with open(self._dir / "meta.json", "w") as meta_file:
+            json.dump(meta, meta_file)
+        return meta
+
+
+def _memmap(path, dtype, shape):
+    # 크기가 0인 파일은 memory-map 할 수 없음
+    if not np.prod(shape):
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class ChunkStore:
+    def __init__(self, directory):
+        self._dir = Path(directory)
+        with open(self._dir / "meta.json", "r") as meta_file:
+            self.meta = json.load(meta_file)
+        count, dim, dtype = self.meta["count"], self.meta["dim"], self.meta["dtype"]
+
+        with open(self._dir / "chunk_ids.txt", "r", encoding="utf-8") as ids_file:
+            self.chunk_ids = ids_file.read().splitlines()
+        with open(self._dir / "sources.json", "r", encoding="utf-8") as sources_file:
+            self._source_values = json.load(sources_file)
+
+        self._source_ids = _memmap(self._dir / "source_ids.u32", np.uint32, (count,))
+        self._text = _memmap(self._dir / "text.bin", np.uint8, (self.meta["text_bytes"],))
+        self._offsets = _memmap(self._dir / "text_offsets.u64", np.uint64, (count + 1,))
+        file_name, numpy_dtype = EMBEDDING_FILES[dtype]
+        self.embeddings = _memmap(self._dir / file_name, numpy_dtype, (count, dim))
+        self.scales = _memmap(self._dir / "scales.f32", np.float32, (count,)) if dtype == "int8" else None
+        self.quantized = dtype != "float32"
+
+        self.sources = _Column(self.source, count)
+        self.texts = _Column(self.text, count)
+
+    @staticmethod
+    def is_store(directory):
+        try:
+            with open(Path(directory) / "meta.json", "r") as meta_file:
+                return json.load(meta_file).get("format") == CHUNK_STORE_FORMAT
+        except FileNotFoundError:
+            return False
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def source(self, i):
+        return self._source_values[self._source_ids[i]]
+
+    def text(self, i):
+        return self._text[int(self._offsets[i]):int(self._offsets[i + 1])].tobytes().decode("utf-8")
+
+    def vector(self, i):
+        # float32면 저장된 값, 양자화된 경우 복원값
+        return dequantize(self.embeddings[i:i + 1], self.scales[i:i + 1] if self.scales is not None else None)[0]
+
+    def nbytes(self):
+        return {path.name: path.stat().st_size for path in sorted(self._dir.iterdir()) if path.is_file()}
+
+
+# ---------------------------
+# 점검 : 로컬 컬렉션의 현재 저장소 크기 + 형식별 양자화 recall
+#   python -m rag.clova_chunk_store potenday_faq --dtype float16,int8
+#   양자화된 저장소는 embedding 캐시에서 원본 float32를 다시 가져와 계산
+# ---------------------------
+def main():
+    import rag.clova_rag_module as rag
+    from rag.clova_local_index import LOCAL_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="로컬 chunk 저장소 크기 / 양자화 recall 점검")
+    parser.add_argument("collection")
+    parser.add_argument("--dtype", default="float16,int8", help="점검할 저장 형식 (쉼표로 구분)")
+    parser.add_argument("--k", type=int, default=CHUNK_STORE_RECALL_K)
+    parser.add_argument("--sample", type=int, default=CHUNK_STORE_RECALL_SAMPLE)
+    args = parser.parse_args()
+
+    collection_dir = LOCAL_INDEX_DIR / args.collection
+    generation_dir = collection_dir / (collection_dir / "CURRENT").read_text().strip()
+    if not ChunkStore.is_store(generation_dir):
+        raise SystemExit(f"{generation_dir}는 이전 형식입니다. 다시 적재하면 chunk 저장소로 바뀝니다.")
+
+    store = ChunkStore(generation_dir)
+    sizes = store.nbytes()
+    print(f"chunk {len(store)}개, 출처 {store.meta['sources']}개, 저장 형식 {store.meta['dtype']}, 전체 {sum(sizes.values()) / 1024:.1f}KB")
+    for name, size in sizes.items():
+        print(f"  {name:<20}{size / 1024:>10.1f}KB")
+    report = store.meta.get("quantization")
+    if report:
+        partial = f" (원본 없는 행 {report['inexact_rows']}개 포함, 실제보다 높게 나올 수 있음)" if report.get("inexact_rows") else ""
+        print(f"적재 시 recall@{report['k']} : {report['recall']:.4f}{partial}")
+
+    # recall은 원본 float32 기준으로만 계산 (복원값끼리 비교하면 손실이 보이지 않음)
+    if store.quantized:
+        originals = rag.cached_chunk_embeddings(list(store.texts))
+        missing = sum(vector is None for vector in originals)
+        if missing:
+            raise SystemExit(f"{generation_dir}의 chunk {missing}개는 embedding 캐시에 원본이 없어 recall을 계산할 수 없습니다.")
+        vectors = np.asarray(originals, dtype=np.float32)
+    else:
+        vectors = np.asarray(store.embeddings, dtype=np.float32)
+    for dtype in [item.strip() for item in args.dtype.split(",") if item.strip()]:
+        report = quantization_recall(vectors, dtype, k=args.k, sample=args.sample)
+        print(f"{dtype:<8} embedding {vectors.shape[0] * vectors.shape[1] * np.dtype(EMBEDDING_FILES[dtype][1]).itemsize / 1024:>10.1f}KB"
+              f"  recall@{report['k']}={report['recall']:.4f} (질의 {report['queries']}개)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import math
+from dotenv import load_dotenv
+
+from rag.clova_lexical_index import tokenize
+
+# .env 파일 로드
+load_dotenv()
+
+# 컨텍스트 구성 설정
+#   벡터 유사도(IP)가 이 값보다 낮은 chunk 제외 (어휘 검색으로만 찾은 chunk는 유지)
+#   문자 2-gram Jaccard 유사도가 이 값 이상이면 같은 내용으로 보고 하나만 사용
+#   reference 전체 토큰 예산 / 토큰 수 추정용 글자 수
+#   예산에 맞춰 자른 조각이 이 토큰 수보다 작으면 넣지 않음
+CONTEXT_DISTANCE_CUTOFF = float(os.getenv("CONTEXT-DISTANCE-CUTOFF", "0.0"))
+CONTEXT_DEDUP_SIMILARITY = float(os.getenv("CONTEXT-DEDUP-SIMILARITY", "0.9"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT-TOKEN-BUDGET", "2000"))
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT-CHARS-PER-TOKEN", "1.5"))
+CONTEXT_MIN_FRAGMENT_TOKENS = int(os.getenv("CONTEXT-MIN-FRAGMENT-TOKENS", "50"))
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN)
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# ---------------------------
+# 컨텍스트 구성 : 유사도 컷 -> 중복 chunk 제거 -> 같은 출처 병합 -> 토큰 예산까지 채우기
+# ---------------------------
+def pack_references(references, token_budget=CONTEXT_TOKEN_BUDGET, distance_cutoff=CONTEXT_DISTANCE_CUTOFF,
+                    dedup_similarity=CONTEXT_DEDUP_SIMILARITY, min_fragment_tokens=CONTEXT_MIN_FRAGMENT_TOKENS):
+    # references : 순위 순서의 {"distance", "source", "text", ...} 목록
+    tokens_before = sum(estimate_tokens(ref["text"]) for ref in references)
+
+    # 1) 유사도 컷
+    candidates = [ref for ref in references if ref.get("distance") is None or ref["distance"] >= distance_cutoff]
+    dropped_by_distance = len(references) - len(candidates)
+
+    # 2) 거의 같은 chunk는 순위가 높은 하나만 사용
+    kept = []
+    kept_tokens = []
+    for ref in candidates:
+        tokens = set(tokenize(ref["text"]))
+        if any(_jaccard(tokens, other) >= dedup_similarity for other in kept_tokens):
+            continue
+        kept.append(ref)
+        kept_tokens.append(tokens)
+    collapsed = len(candidates) - len(kept)
+
+    tokens_kept = sum(estimate_tokens(ref["text"]) for ref in kept)
+
+    # 3) 같은 출처는 하나의 reference로 병합 (처음 등장한 순위 유지)
+    merged = {}
+    for ref in kept:
+        merged.setdefault(ref["source"], []).append(ref["text"])
+
+    # 4) 순위 순서대로 토큰 예산까지 채우고, 넘치는 reference는 남은 예산만큼 잘라서 사용
+    #    잘린 조각이 min_fragment_tokens보다 작으면 넣지 않음 (뒤의 더 짧은 reference는 계속 확인)
+    packed = []
+    remaining = token_budget
+    tokens_merged = 0
+    for source, texts in merged.items():
+        text = "\n".join(texts)
+        tokens = estimate_tokens(text)
+        tokens_merged += tokens
+        if tokens > remaining:
+            if remaining < min_fragment_tokens:
+                continue
+            text = text[:int(remaining * CONTEXT_CHARS_PER_TOKEN)]
+            tokens = estimate_tokens(text)
+        packed.append({"source": source, "text": text})
+        remaining -= tokens
+
+    tokens_after = sum(estimate_tokens(ref["text"]) for ref in packed)
+    # 절약 : 유사도 컷 / 중복 제거로 뺀 토큰 + 예산 초과로 자르거나 뺀 토큰
+    #   병합 시 구분자로 늘어난 토큰은 merge_overhead로 따로 집계
+    tokens_saved = (tokens_before - tokens_kept) + (tokens_merged - tokens_after)
+    report = {
+        "references_in": len(references),
+        "references_out": len(packed),
+        "dropped_by_distance": dropped_by_distance,
+        "collapsed_duplicates": collapsed,
+        "merged_sources": len(kept) - len(merged),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_saved,
+        "merge_overhead": max(0, tokens_merged - tokens_kept)
+    }
+    return packed, report
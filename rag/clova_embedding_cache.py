@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from pathlib import Path
+from dotenv import load_dotenv
+
+from common.clova_corpus_version import RAG_CACHE_DIR
+
+# .env 파일 로드
+load_dotenv()
+
+# 최대 저장 벡터 수 (초과 시 가장 오래 사용하지 않은 항목부터 삭제)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING-CACHE-MAX-ENTRIES", "200000"))
+
+# 조회 시각(last_access)은 모아 두었다가 이 개수 / 초가 넘거나 저장·삭제할 때 한 번에 기록 (조회마다 commit 하지 않음)
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("EMBEDDING-CACHE-TOUCH-BATCH", "1000"))
+EMBEDDING_CACHE_TOUCH_INTERVAL = float(os.getenv("EMBEDDING-CACHE-TOUCH-INTERVAL", "60"))
+
+
+# ---------------------------
+# Embedding 캐시 : hash(모델 endpoint, 텍스트) -> float32 벡터 (SQLite BLOB)
+# ---------------------------
+class EmbeddingCache:
+    def __init__(self, path=None, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        path = Path(path or Path(RAG_CACHE_DIR) / "embeddings.sqlite3")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embedding_last_access ON embedding(last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+        self._touched = {}
+        self._touched_flushed_at = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint, text):
+        return hashlib.sha256(f"{endpoint}\n{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(vector):
+        return array('f', vector).tobytes()
+
+    @staticmethod
+    def _decode(blob):
+        vector = array('f')
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, endpoint, texts):
+        keys = [self.make_key(endpoint, text) for text in texts]
+        found = {}
+
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            now = time.time()
+            for key in found:
+                self._touched[key] = now
+            if len(self._touched) >= EMBEDDING_CACHE_TOUCH_BATCH or \
+                    time.monotonic() - self._touched_flushed_at >= EMBEDDING_CACHE_TOUCH_INTERVAL:
+                self._flush_touched()
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return [self._decode(found[key]) if key in found else None for key in keys]
+
+    def get(self, endpoint, text):
+        return self.get_many(endpoint, [text])[0]
+
+    def put_many(self, endpoint, items):
+        rows = [(self.make_key(endpoint, text), self._encode(vector), time.time()) for text, vector in items]
+        if not rows:
+            return
+
+        with self._lock:
+            self._flush_touched()
+            inserted = 0
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embedding (key, vector, last_access) VALUES (?, ?, ?)", row
+                )
+                inserted += cursor.rowcount
+            self._size += inserted
+
+            if self._size > self._max_entries:
+                self._evict(self._size - self._max_entries)
+            self._conn.commit()
+
+    def put(self, endpoint, text, vector):
+        self.put_many(endpoint, [(text, vector)])
+
+    def _flush_touched(self):
+        # 모아 둔 조회 시각 기록 (commit은 호출한 쪽에서)
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embedding SET last_access = ? WHERE key = ?", [(now, key) for key, now in self._touched.items()]
+            )
+            self._touched = {}
+        self._touched_flushed_at = time.monotonic()
+
+    def _evict(self, count):
+        self._conn.execute(
+            "DELETE FROM embedding WHERE key IN ("
+            " SELECT key FROM embedding ORDER BY last_access ASC LIMIT ?)", (count,)
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._size,
+            "max_entries": self._max_entries
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
@@ -1,6 +1,35 @@
 import json
-import http.client
-import requests
+import time
+import random
+import asyncio
+import threading
+
+from common.clova_http_client import get_session, base_url, ClovaAPIError
+from common.clova_async_http_client import get_async_client, drop_empty_headers
+from common.clova_sse import CompletionStream
+from common import clova_tracing as tracing
+
+
+# QPS 제한 : 토큰 버킷 (여러 스레드가 하나의 버킷을 공유)
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self._rate = float(rate)
+        self._capacity = float(capacity or max(1.0, self._rate))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
 
 # Chunking : 문단 나누기
 class SegmentationExecutor:
@@ -18,11 +47,13 @@ class SegmentationExecutor:
             'X-NCP-CLOVASTUDIO-REQUEST-ID': self._request_id
         }
 
-        conn = http.client.HTTPSConnection(self._host)
-        conn.request('POST', '/testapp/v1/api-tools/segmentation/73d7ecf6f64e4986aa1ea1b01359e726', json.dumps(completion_request), headers)
-        response = conn.getresponse()
-        result = json.loads(response.read().decode(encoding='utf-8'))
-        conn.close()
+        with tracing.span("segmentation.request"):
+            response = get_session().post(
+                base_url(self._host) + '/testapp/v1/api-tools/segmentation/73d7ecf6f64e4986aa1ea1b01359e726',
+                data=json.dumps(completion_request),
+                headers=headers
+            )
+        result = json.loads(response.content.decode(encoding='utf-8'))
         return result
 
     def execute(self, completion_request):
@@ -34,51 +65,135 @@ class SegmentationExecutor:
         
 # Embedding : 벡터화
 class EmbeddingExecutor:
-    def __init__(self, host, api_key, api_key_primary_val, request_id):
+    path = '/testapp/v1/api-tools/embedding/v2/2296ea6a879a4a4498337e5f2d0cc789'
+
+    def __init__(self, host, api_key, api_key_primary_val, request_id, rate_limiter=None, max_retries=0, backoff=0.5):
         self._host = host
         self._api_key = api_key
         self._api_key_primary_val = api_key_primary_val
         self._request_id = request_id
+        self._rate_limiter = rate_limiter
+        self._max_retries = max_retries
+        self._backoff = backoff
 
-    def _send_request(self, completion_request):
-        headers = {
+    # 캐시 key에 사용 (endpoint가 바뀌면 다른 모델의 벡터로 취급)
+    @property
+    def endpoint(self):
+        return base_url(self._host) + self.path
+
+    def _headers(self):
+        return {
             'Content-Type': 'application/json; charset=utf-8',
             'X-NCP-CLOVASTUDIO-API-KEY': self._api_key,
             'X-NCP-APIGW-API-KEY': self._api_key_primary_val,
             'X-NCP-CLOVASTUDIO-REQUEST-ID': self._request_id
         }
 
-        conn = http.client.HTTPSConnection(self._host)
-        conn.request(
-            'POST', 
-            '/testapp/v1/api-tools/embedding/v2/2296ea6a879a4a4498337e5f2d0cc789', 
-            json.dumps(completion_request), 
-            headers
+    def _send_request(self, completion_request):
+        headers = self._headers()
+
+        response = get_session().post(
+            self.endpoint,
+            data=json.dumps(completion_request),
+            headers=headers
         )
-        response = conn.getresponse()
-        result = json.loads(response.read().decode(encoding='utf-8'))
-        conn.close()
-        return result
+        status = response.status_code
+        try:
+            result = json.loads(response.content.decode(encoding='utf-8'))
+        except json.JSONDecodeError:
+            result = {"status": {"code": str(status), "message": response.reason}}
+        return status, result
 
-    def execute(self, completion_request):
-        res = self._send_request(completion_request)
-        if res['status']['code'] == '20000':
+    @staticmethod
+    def _parse_result(status, res):
+        if res.get('status', {}).get('code') == '20000':
             return res['result']['embedding']
         else:
-            error_code = res["status"]["code"]
+            error_code = res.get("status", {}).get("code", status)
             error_message = res.get("status", {}).get("message", "Unknown error")
-            raise ValueError(f"오류 발생: {error_code}: {error_message}")
+            raise ClovaAPIError(status, error_code, error_message)
+
+    def _retry_delay(self, attempt):
+        # 지수 백오프 + jitter
+        return self._backoff * (2 ** attempt) + random.uniform(0, self._backoff)
+
+    def _request_once(self, completion_request):
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+
+        with tracing.span("embedding.request"):
+            status, res = self._send_request(completion_request)
+        return self._parse_result(status, res)
+
+    def execute(self, completion_request):
+        attempt = 0
+        while True:
+            try:
+                return self._request_once(completion_request)
+            except ClovaAPIError as e:
+                if not e.retryable or attempt >= self._max_retries:
+                    raise
+            except OSError:
+                # requests 연결/타임아웃 오류 (RequestException은 OSError 하위 클래스)
+                if attempt >= self._max_retries:
+                    raise
+
+            with tracing.span("embedding.retry_wait"):
+                time.sleep(self._retry_delay(attempt))
+            attempt += 1
+
+
+# Embedding (asyncio) : 요청을 기다리는 동안 이벤트 루프가 다른 요청을 처리
+class AsyncEmbeddingExecutor(EmbeddingExecutor):
+    async def _send_request(self, completion_request):
+        response = await get_async_client().post(self.endpoint, json=completion_request, headers=drop_empty_headers(self._headers()))
+        status = response.status_code
+        try:
+            result = response.json()
+        except json.JSONDecodeError:
+            result = {"status": {"code": str(status), "message": response.reason_phrase}}
+        return status, result
+
+    async def _request_once(self, completion_request):
+        if self._rate_limiter is not None:
+            # 토큰 버킷은 blocking 대기이므로 스레드에서 기다림
+            await asyncio.to_thread(self._rate_limiter.acquire)
+
+        with tracing.span("embedding.request"):
+            status, res = await self._send_request(completion_request)
+        return self._parse_result(status, res)
+
+    async def execute(self, completion_request):
+        import httpx
+
+        attempt = 0
+        while True:
+            try:
+                return await self._request_once(completion_request)
+            except ClovaAPIError as e:
+                if not e.retryable or attempt >= self._max_retries:
+                    raise
+            except (OSError, httpx.TransportError):
+                if attempt >= self._max_retries:
+                    raise
+
+            with tracing.span("embedding.retry_wait"):
+                await asyncio.sleep(self._retry_delay(attempt))
+            attempt += 1
         
 # Retieval -> HyperCLOVA X
 class CompletionExecutor:
+    # 단계별 소요 시간 기록 이름 (ttfb : 응답 헤더 / ttft : 첫 토큰 / total : 전체)
+    trace_name = "completion"
+
     def __init__(self, host, api_key, api_key_primary_val, request_id):
         self._host = host
         self._api_key = api_key
         self._api_key_primary_val = api_key_primary_val
         self._request_id = request_id
 
-    def execute(self, completion_request, response_type="stream"):
-        headers = {
+    def _headers(self):
+        return {
             'X-NCP-CLOVASTUDIO-API-KEY': self._api_key,
             'X-NCP-APIGW-API-KEY': self._api_key_primary_val,
             'X-NCP-CLOVASTUDIO-REQUEST-ID': self._request_id,
@@ -86,26 +201,59 @@ class CompletionExecutor:
             'Accept': 'text/event-stream'
         }
 
-        final_answer = ""
+    @property
+    def url(self):
+        return base_url(self._host) + '/testapp/v1/chat-completions/HCX-DASH-001'
 
-        with requests.post(
-            self._host + '/testapp/v1/chat-completions/HCX-DASH-001',
-            headers=headers, 
+    def _post(self, completion_request):
+        return get_session().post(
+            self.url,
+            headers=self._headers(), 
             json=completion_request, 
             stream=True
-        ) as r:
-            if response_type == "stream":
-                longest_line = ""
-                for line in r.iter_lines():
-                    if line:
-                        decoded_line = line.decode("utf-8")
-                        if decoded_line.startswith("data:"):
-                            event_data = json.loads(decoded_line[len("data:"):])
-                            message_content = event_data.get("message", {}).get("content", "")
-                            if len(message_content) > len(longest_line):
-                                longest_line = message_content
-                final_answer = longest_line
-            elif response_type == "single":
-                final_answer = r.json()  # 가정: 단일 응답이 JSON 형태로 반환됨
-        
-        return final_answer
\ No newline at end of file
+        )
+
+    def execute(self, completion_request, response_type="stream"):
+        if response_type == "single":
+            with self._post(completion_request) as r:
+                return r.json()  # 가정: 단일 응답이 JSON 형태로 반환됨
+        return self.complete(completion_request).content
+
+    def stream(self, completion_request, completion=None):
+        # SSE 'token' 이벤트가 도착하는 대로 토큰을 하나씩 반환 ('result' 이벤트를 받으면 바로 연결 종료)
+        completion = completion or CompletionStream(self.trace_name)
+        try:
+            with self._post(completion_request) as r:
+                completion.opened(r.status_code, None if r.status_code == 200 else r.content)
+                yield from completion.consume(r.iter_content(chunk_size=None))
+        finally:
+            completion.finish()
+
+    def complete(self, completion_request):
+        # 전체 답변 + 토큰 사용량(input_length / output_length)이 담긴 CompletionStream 반환
+        completion = CompletionStream(self.trace_name)
+        for _ in self.stream(completion_request, completion):
+            pass
+        return completion
+
+
+# Retieval -> HyperCLOVA X (asyncio)
+class AsyncCompletionExecutor(CompletionExecutor):
+    async def stream(self, completion_request, completion=None):
+        completion = completion or CompletionStream(self.trace_name)
+        try:
+            async with get_async_client().stream("POST", self.url, headers=drop_empty_headers(self._headers()), json=completion_request) as r:
+                completion.opened(r.status_code, None if r.status_code == 200 else await r.aread())
+                async for token in completion.aconsume(r.aiter_bytes()):
+                    yield token
+        finally:
+            completion.finish()
+
+    async def complete(self, completion_request):
+        completion = CompletionStream(self.trace_name)
+        async for _ in self.stream(completion_request, completion):
+            pass
+        return completion
+
+    async def execute(self, completion_request):
+        return (await self.complete(completion_request)).content
@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import math
+import uuid
+import shutil
+import unicodedata
+from pathlib import Path
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+import numpy as np
+
+from common.clova_corpus_version import RAG_CACHE_DIR
+from rag.clova_local_index import LocalHit
+
+# .env 파일 로드
+load_dotenv()
+
+# 어휘(lexical) 인덱스 저장 위치 / BM25 파라미터
+LEXICAL_INDEX_DIR = Path(os.getenv("LEXICAL-INDEX-DIR", str(Path(RAG_CACHE_DIR) / "lexical_index")))
+BM25_K1 = float(os.getenv("BM25-K1", "1.2"))
+BM25_B = float(os.getenv("BM25-B", "0.75"))
+
+# 단어 경계 : 한글/영문/숫자 이외 문자
+_WORD_SPLIT = re.compile(r"[^0-9a-z가-힣]+")
+
+
+def tokenize(text):
+    # 한국어는 조사/어미가 붙어 단어 단위 일치가 어려우므로 단어 안의 문자 2-gram을 토큰으로 사용
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for word in _WORD_SPLIT.split(text):
+        if not word:
+            continue
+        if len(word) == 1:
+            tokens.append(word)
+            continue
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+# ---------------------------
+# BM25 역색인 : 토큰 -> (chunk 번호 uint32, 출현 횟수 uint16) posting 배열
+#   <dir>/CURRENT -> gen-*/{vocab.json, postings_doc.u32, postings_tf.u16, doc_len.u32, docs.jsonl}
+# ---------------------------
+class LexicalIndex:
+    def __init__(self, generation_dir):
+        with open(generation_dir / "vocab.json", "r") as vocab_file:
+            meta = json.load(vocab_file)
+        # vocab : 토큰 -> [posting 시작 위치, posting 개수]
+        self._vocab = meta["vocab"]
+        self._avg_doc_len = meta["avg_doc_len"]
+        self._postings_doc = np.fromfile(generation_dir / "postings_doc.u32", dtype=np.uint32)
+        self._postings_tf = np.fromfile(generation_dir / "postings_tf.u16", dtype=np.uint16).astype(np.float32)
+        self._doc_len = np.fromfile(generation_dir / "doc_len.u32", dtype=np.uint32).astype(np.float32)
+
+        self._chunk_ids, self._sources, self._texts = [], [], []
+        with open(generation_dir / "docs.jsonl", "r") as docs_file:
+            for line in docs_file:
+                row = json.loads(line)
+                self._chunk_ids.append(row["chunk_id"])
+                self._sources.append(row["source"])
+                self._texts.append(row["text"])
+
+        # 문서 길이 정규화 항은 질의와 무관하므로 미리 계산
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len / max(self._avg_doc_len, 1e-9))
+
+    @property
+    def num_docs(self):
+        return len(self._chunk_ids)
+
+    def _idf(self, df):
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def score(self, query):
+        # 질의 토큰별 posting을 더해 전체 chunk 점수를 계산 + 토큰별 idf
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        query_terms = {}
+        for token in set(tokenize(query)):
+            entry = self._vocab.get(token)
+            if entry is None:
+                query_terms[token] = (None, 0.0)
+                continue
+            start, count = entry
+            docs = self._postings_doc[start:start + count]
+            tf = self._postings_tf[start:start + count]
+            idf = self._idf(count)
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+            query_terms[token] = (docs, idf)
+        return scores, query_terms
+
+    def search(self, query, limit=10):
+        if not self.num_docs:
+            return [], {}
+        scores, query_terms = self.score(query)
+        k = min(limit, self.num_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = [
+            LocalHit(self._chunk_ids[i], float(scores[i]), {"source": self._sources[i], "text": self._texts[i]})
+            for i in top if scores[i] > 0
+        ]
+        return hits, {"terms": query_terms, "top_doc": int(top[0]) if hits else None}
+
+    def coverage(self, detail):
+        # 질의 토큰 idf 합 중에서 1위 chunk가 포함하는 비율 (1.0이면 모든 토큰이 나타남)
+        if detail.get("top_doc") is None:
+            return 0.0
+        total = matched = 0.0
+        for docs, idf in detail["terms"].values():
+            weight = idf if docs is not None else self._idf(0)
+            total += weight
+            if docs is not None and np.any(docs == detail["top_doc"]):
+                matched += weight
+        return matched / total if total else 0.0
+
+    # ---------- 적재 시점 인덱스 생성 ----------
+    @staticmethod
+    def build(index_dir, rows):
+        # rows : (chunk_id, source, text) iterable
+        index_dir = Path(index_dir)
+        generation_dir = index_dir / f"gen-{uuid.uuid4().hex[:8]}"
+        generation_dir.mkdir(parents=True)
+
+        postings = defaultdict(list)
+        doc_lens = []
+        with open(generation_dir / "docs.jsonl", "w") as docs_file:
+            for doc_no, (chunk_id, source, text) in enumerate(rows):
+                counts = Counter(tokenize(text))
+                for token, tf in counts.items():
+                    postings[token].append((doc_no, min(tf, 65535)))
+                doc_lens.append(sum(counts.values()))
+                docs_file.write(json.dumps({"chunk_id": chunk_id, "source": source, "text": text}, ensure_ascii=False) + "\n")
+
+        vocab = {}
+        postings_doc, postings_tf = [], []
+        offset = 0
+        for token in sorted(postings):
+            entries = postings[token]
+            vocab[token] = [offset, len(entries)]
+            postings_doc.extend(doc_no for doc_no, _ in entries)
+            postings_tf.extend(tf for _, tf in entries)
+            offset += len(entries)
+
+        np.asarray(postings_doc, dtype=np.uint32).tofile(generation_dir / "postings_doc.u32")
+        np.asarray(postings_tf, dtype=np.uint16).tofile(generation_dir / "postings_tf.u16")
+        np.asarray(doc_lens, dtype=np.uint32).tofile(generation_dir / "doc_len.u32")
+        with open(generation_dir / "vocab.json", "w") as vocab_file:
+            json.dump({"vocab": vocab, "avg_doc_len": (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0}, vocab_file, ensure_ascii=False)
+
+        # CURRENT 교체 후 이전 generation 삭제
+        current = index_dir / "CURRENT"
+        previous = current.read_text().strip() if current.exists() else None
+        tmp_current = index_dir / "CURRENT.tmp"
+        tmp_current.write_text(generation_dir.name)
+        tmp_current.replace(current)
+        if previous and previous != generation_dir.name:
+            shutil.rmtree(index_dir / previous, ignore_errors=True)
+
+        print(f"Lexical 인덱스 생성 완료: chunk {len(doc_lens)}개, 토큰 {len(vocab)}개, posting {offset}개")
+
+
+# 인덱스 디렉토리별로 로드한 인덱스 재사용 (CURRENT가 바뀌면 다시 로드)
+_loaded_indexes = {}
+
+
+def load_lexical_index(index_dir):
+    current = Path(index_dir) / "CURRENT"
+    try:
+        generation = current.read_text().strip()
+    except FileNotFoundError:
+        return None
+
+    cached = _loaded_indexes.get(str(index_dir))
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    index = LexicalIndex(Path(index_dir) / generation)
+    _loaded_indexes[str(index_dir)] = (generation, index)
+    return index
+
+
+def reciprocal_rank_fusion(ranked_lists, limit=10, k=60):
+    # 여러 검색 결과의 순위를 1 / (k + 순위) 합으로 통합 -> (chunk_id, 점수, 목록별 hit 또는 None)
+    scores = {}
+    hits = {}
+    for list_no, ranked in enumerate(ranked_lists):
+        for rank, hit in enumerate(ranked, start=1):
+            scores[hit.id] = scores.get(hit.id, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit.id, [None] * len(ranked_lists))[list_no] = hit
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [(chunk_id, scores[chunk_id], hits[chunk_id]) for chunk_id in ordered]
@@ -0,0 +1,264 @@
+import os
+import json
+import shutil
+import threading
+from collections import namedtuple
+from pathlib import Path
+from dotenv import load_dotenv
+
+import numpy as np
+
+from common.clova_corpus_version import RAG_CACHE_DIR
+from rag.clova_chunk_store import ChunkStore, ChunkStoreWriter, CHUNK_STORE_DTYPE, score_matrix
+
+# .env 파일 로드
+load_dotenv()
+
+# 로컬 벡터 인덱스 저장 위치
+LOCAL_INDEX_DIR = Path(os.getenv("LOCAL-INDEX-DIR", str(Path(RAG_CACHE_DIR) / "local_index")))
+EMBEDDING_DIM = 1024
+
+
+# ---------------------------
+# 검색 결과 : pymilvus Hit과 같은 방식으로 사용 (hit.id, hit.distance, hit.entity.get("text"))
+# ---------------------------
+class LocalEntity:
+    def __init__(self, fields):
+        self._fields = fields
+
+    def get(self, field_name):
+        return self._fields.get(field_name)
+
+
+class LocalHit:
+    def __init__(self, chunk_id, distance, fields):
+        self.id = chunk_id
+        self.distance = distance
+        self.entity = LocalEntity(fields)
+
+
+# ---------------------------
+# 한 generation의 읽기 전용 snapshot : 행렬 / id / 출처 / 본문을 한 객체로 묶어 한 번에 교체
+#   (검색 도중 generation이 바뀌어도 새 행렬과 이전 id가 섞이지 않음)
+# ---------------------------
+class _Snapshot(namedtuple("_Snapshot", ["marker", "store", "matrix", "scales", "chunk_ids", "sources", "texts"])):
+    __slots__ = ()
+
+    @property
+    def quantized(self):
+        return self.store is not None and self.store.quantized
+
+    def vector(self, i):
+        return self.store.vector(i) if self.store is not None else np.asarray(self.matrix[i], dtype=np.float32)
+
+
+_EMPTY_SNAPSHOT = _Snapshot(None, None, np.zeros((0, EMBEDDING_DIM), dtype=np.float32), None, (), (), ())
+
+
+def _load_legacy(generation_dir, marker):
+    # 이전 형식 generation : {embeddings.f32, chunks.jsonl, meta.json}, 다음 flush 때 chunk 저장소로 바뀜
+    with open(generation_dir / "meta.json", "r") as meta_file:
+        meta = json.load(meta_file)
+
+    count, dim = meta["count"], meta["dim"]
+    if count:
+        matrix = np.memmap(generation_dir / "embeddings.f32", dtype=np.float32, mode="r", shape=(count, dim))
+    else:
+        matrix = np.zeros((0, dim), dtype=np.float32)
+
+    chunk_ids, sources, texts = [], [], []
+    with open(generation_dir / "chunks.jsonl", "r") as chunks_file:
+        for line in chunks_file:
+            row = json.loads(line)
+            chunk_ids.append(row["chunk_id"])
+            sources.append(row["source"])
+            texts.append(row["text"])
+    return _Snapshot(marker, None, matrix, None, chunk_ids, sources, texts)
+
+
+# ---------------------------
+# 로컬 컬렉션 : Milvus 서버 없이 프로세스 안에서 내적(IP) top-k 검색
+#   <LOCAL_INDEX_DIR>/<collection>/CURRENT -> gen-N/ (열 단위 chunk 저장소, rag/clova_chunk_store.py)
+#   embedding 저장 형식은 CHUNK-STORE-DTYPE (float32 / float16 / int8)
+#   original_vectors(texts) : 양자화된 기존 행을 다시 쓸 때 원본 float32를 구하는 함수 (없는 행은 None)
+#   적재가 끝나면 새 generation 디렉토리를 만들고 CURRENT만 교체 (검색 중인 프로세스는 다음 검색부터 새 데이터 사용)
+# ---------------------------
+class LocalCollection:
+    def __init__(self, name, root=None, dtype=CHUNK_STORE_DTYPE, original_vectors=None):
+        self.name = name
+        self.dtype = dtype
+        self._original_vectors = original_vectors
+        self._dir = Path(root or LOCAL_INDEX_DIR) / name
+        self._lock = threading.Lock()
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._pending = []
+        self._deleted = set()
+
+    # ---------- 읽기 ----------
+    @staticmethod
+    def exists(name, root=None):
+        return (Path(root or LOCAL_INDEX_DIR) / name / "CURRENT").exists()
+
+    @staticmethod
+    def drop(name, root=None):
+        shutil.rmtree(Path(root or LOCAL_INDEX_DIR) / name, ignore_errors=True)
+
+    def _current_marker(self):
+        current = self._dir / "CURRENT"
+        try:
+            return current.read_text().strip(), current.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        # 현재 generation의 snapshot 반환 (generation이 바뀌었으면 새로 읽어 한 번에 교체)
+        marker = self._current_marker()
+        snapshot = self._snapshot
+        if marker == snapshot.marker:
+            return snapshot
+
+        with self._lock:
+            if marker == self._snapshot.marker:
+                return self._snapshot
+            while True:
+                try:
+                    snapshot = self._read_generation(marker)
+                    break
+                except FileNotFoundError:
+                    # CURRENT를 읽은 뒤 다른 프로세스가 새 generation으로 교체하고 이전 generation을 삭제한 경우
+                    retry_marker = self._current_marker()
+                    if retry_marker == marker:
+                        raise
+                    marker = retry_marker
+            self._snapshot = snapshot
+            return snapshot
+
+    def _read_generation(self, marker):
+        if marker is None:
+            return _EMPTY_SNAPSHOT
+        generation_dir = self._dir / marker[0]
+        if ChunkStore.is_store(generation_dir):
+            # 벡터 / 본문 / 출처 번호는 복사 없이 memory-map
+            store = ChunkStore(generation_dir)
+            return _Snapshot(marker, store, store.embeddings, store.scales, store.chunk_ids, store.sources, store.texts)
+        return _load_legacy(generation_dir, marker)
+
+    def _kept_originals(self, snapshot, rows):
+        # 양자화된 기존 행은 원본 float32로 다시 저장 (recall 점검 기준 / 저장 형식을 바꿔도 이전 양자화 손실이 남지 않음)
+        if not snapshot.quantized or self._original_vectors is None:
+            return [None] * len(rows)
+        return self._original_vectors([snapshot.texts[i] for i in rows])
+
+    def store_info(self):
+        # 현재 generation의 저장 형식 / 파일 크기 / 적재 시 양자화 recall (이전 형식이면 None)
+        store = self.load().store
+        if store is None:
+            return None
+        return dict(store.meta, files=store.nbytes())
+
+    @property
+    def num_entities(self):
+        return len(self.load().chunk_ids)
+
+    def chunk_ids(self):
+        return set(self.load().chunk_ids)
+
+    def rows(self):
+        snapshot = self.load()
+        return zip(snapshot.chunk_ids, snapshot.sources, snapshot.texts)
+
+    def search(self, data, anns_field="embedding", param=None, limit=10, output_fields=None):
+        # snapshot은 한 번만 읽음 (검색 중 generation이 바뀌어도 행렬과 id/본문이 같은 generation)
+        snapshot = self.load()
+        chunk_ids, sources, texts = snapshot.chunk_ids, snapshot.sources, snapshot.texts
+
+        queries = np.asarray(data, dtype=np.float32).reshape(len(data), -1)
+        if not len(chunk_ids):
+            return [[] for _ in range(len(queries))]
+
+        # (질문 수 x 차원) @ (차원 x chunk 수) 한 번의 행렬곱으로 전체 점수 계산 (양자화된 행렬은 block 단위)
+        scores = score_matrix(queries, snapshot.matrix, snapshot.scales)
+        k = min(limit, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        output_fields = output_fields or []
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            hits = []
+            for i in ordered:
+                fields = {}
+                if "source" in output_fields:
+                    fields["source"] = sources[i]
+                if "text" in output_fields:
+                    fields["text"] = texts[i]
+                hits.append(LocalHit(chunk_ids[i], float(scores[row, i]), fields))
+            results.append(hits)
+
+        return results
+
+    # ---------- 쓰기 (Collection.upsert / delete / flush 대응) ----------
+    def upsert(self, columns):
+        chunk_ids, sources, texts, embeddings = columns
+        # float list 대신 float32 행렬로 보관 (flush 전까지 쌓이는 메모리를 차원당 4바이트로)
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(chunk_ids), EMBEDDING_DIM)
+        with self._lock:
+            self._pending.extend(zip(chunk_ids, sources, texts, vectors))
+
+    def delete_ids(self, chunk_ids):
+        with self._lock:
+            self._deleted.update(chunk_ids)
+
+    def flush(self):
+        snapshot = self.load()
+        with self._lock:
+            if not self._pending and not self._deleted and snapshot.marker is not None:
+                return
+
+            replaced = {row[0] for row in self._pending} | self._deleted
+            generation = f"gen-{(int(snapshot.marker[0].split('-')[1]) + 1) if snapshot.marker else 1}"
+            generation_dir = self._dir / generation
+            shutil.rmtree(generation_dir, ignore_errors=True)
+            generation_dir.mkdir(parents=True)
+
+            # 기존 행(삭제/교체 대상 제외)을 스트리밍으로 복사한 뒤 새 행을 이어 씀
+            writer = ChunkStoreWriter(generation_dir, EMBEDDING_DIM, self.dtype)
+            kept = [i for i, chunk_id in enumerate(snapshot.chunk_ids) if chunk_id not in replaced]
+            for start in range(0, len(kept), 1000):
+                block = kept[start:start + 1000]
+                for i, original in zip(block, self._kept_originals(snapshot, block)):
+                    if original is not None:
+                        vector, exact = original, True
+                    else:
+                        vector, exact = snapshot.vector(i), not snapshot.quantized
+                    writer.append(snapshot.chunk_ids[i], snapshot.sources[i], snapshot.texts[i], vector, exact=exact)
+
+            # 같은 id가 여러 번 들어오면 마지막 값만 사용
+            latest = {}
+            for row in self._pending:
+                latest[row[0]] = row
+            for chunk_id, source, text, embedding in latest.values():
+                if chunk_id in self._deleted:
+                    continue
+                writer.append(chunk_id, source, text, embedding)
+            meta = writer.close()
+
+            if meta["quantization"] and meta["count"]:
+                report = meta["quantization"]
+                inexact = f", 원본 없는 행 {report['inexact_rows']}개 포함" if report.get("inexact_rows") else ""
+                print(f"{self.name}: embedding {meta['dtype']} 저장, recall@{report['k']} {report['recall']:.4f} (float32 대비, 질의 {report['queries']}개{inexact})")
+
+            # CURRENT 교체는 rename 한 번으로 원자적으로 처리
+            tmp_current = self._dir / "CURRENT.tmp"
+            tmp_current.write_text(generation)
+            tmp_current.replace(self._dir / "CURRENT")
+
+            previous = snapshot.marker[0] if snapshot.marker else None
+            self._pending = []
+            self._deleted = set()
+
+        self.load()
+
+        # 이전 generation 삭제 (이미 memory-map 한 프로세스는 그대로 읽을 수 있음)
+        if previous and previous != generation:
+            shutil.rmtree(self._dir / previous, ignore_errors=True)
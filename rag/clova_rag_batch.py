@@ -0,0 +1,36 @@
+import json
+import argparse
+from datetime import datetime
+
+import rag.clova_rag_module as rag
+
+# ---------------------------
+# RAG 배치 질의 : 질문 파일의 모든 질문을 한 번에 답변하고 결과를 JSONL로 기록
+#   입력 : 한 줄에 질문 하나 (텍스트) 또는 {"question": "..."} JSONL (golden 질문 세트도 사용 가능)
+#   출력 : 한 줄에 {"index", "question", "answer", "sources", "fast_path", "timings_ms", ...}
+# ---------------------------
+parser = argparse.ArgumentParser(description="포텐데이 FAQ RAG 배치 질의")
+parser.add_argument("questions", help="질문 파일 경로")
+parser.add_argument("--output", default="rag_batch_answers.jsonl")
+parser.add_argument("--collection", default="potenday_faq")
+parser.add_argument("--backend", choices=["milvus", "local"], default=rag.RAG_BACKEND)
+parser.add_argument("--limit", type=int, default=10, help="질문별 검색 chunk 수")
+parser.add_argument("--concurrency", type=int, default=rag.BATCH_COMPLETION_CONCURRENCY, help="completion 동시 요청 수")
+parser.add_argument("--embed-concurrency", type=int, default=rag.BATCH_EMBED_CONCURRENCY, help="질문 embedding 동시 요청 수")
+args = parser.parse_args()
+
+questions = []
+with open(args.questions, "r", encoding="utf-8") as questions_file:
+    for line in questions_file:
+        line = line.strip()
+        if line:
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+
+summary = rag.chat_with_rag_batch(
+    questions, args.collection, args.output, args.backend,
+    limit=args.limit, concurrency=args.concurrency, embed_concurrency=args.embed_concurrency
+)
+
+print(f"질문 {summary['questions']}개 : 답변 {summary['answered']}개, 실패 {summary['failed']}개, "
+      f"어휘 검색 fast path {summary['fast_path']}개, {summary['elapsed_s']}초 ({summary['questions_per_s']}개/초)")
+print(f"-------------------- RAG 배치 질의 완료({datetime.now()}) : {args.output} -------------------- ")
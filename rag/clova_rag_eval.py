@@ -0,0 +1,159 @@
+import json
+import time
+import argparse
+import itertools
+from pathlib import Path
+
+import rag.clova_rag_module as rag
+from rag.clova_lexical_index import load_lexical_index
+
+# ---------------------------
+# 검색 품질/지연 시간 평가 : golden 질문 세트(JSONL)로 recall@k, MRR, 검색 지연 시간 측정
+#   golden 한 줄 : {"question": "...", "sources": ["기대 출처 URL", ...]}  ("source": "URL" 도 허용)
+#   질문 embedding은 embedding 캐시를 사용하므로 같은 질문 세트로 반복 실행하면 API 호출 없음
+# ---------------------------
+
+
+def load_golden_set(path):
+    golden = []
+    with open(path, "r", encoding="utf-8") as golden_file:
+        for line_no, line in enumerate(golden_file, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            sources = row.get("sources") or ([row["source"]] if row.get("source") else [])
+            if not row.get("question") or not sources:
+                raise ValueError(f"{path}:{line_no}: 'question'과 'sources'(또는 'source')가 필요합니다")
+            golden.append({"question": row["question"], "sources": set(sources)})
+    return golden
+
+
+def ensure_query_embeddings(golden, cache_only):
+    # 평가 전에 질문 embedding을 캐시에 준비 (cache_only이면 캐시에 없는 질문이 있을 때 중단)
+    endpoint = rag.get_query_embedding_executor().endpoint
+    cache = rag.get_embedding_cache()
+    missing = [row["question"] for row in golden if cache.get(endpoint, row["question"]) is None]
+    if missing and cache_only:
+        raise SystemExit(f"embedding 캐시에 없는 질문 {len(missing)}개 (예: {missing[0]!r}) - --cache-only 없이 한 번 실행해 캐시를 채우세요")
+    for question in missing:
+        rag.query_embed(question)
+    return len(missing)
+
+
+def retrieve(collection, mode, question, limit, ef):
+    if mode == "hybrid":
+        return [ref["source"] for ref in rag.retrieve_references(collection, question, limit=limit, ef=ef)]
+    if mode == "vector":
+        hits = rag.search_collection(collection, [rag.query_embed(question)], limit=limit, ef=ef)[0]
+        return [hit.entity.get("source") for hit in hits]
+    if mode == "lexical":
+        backend = "local" if isinstance(collection, rag.LocalCollection) else "milvus"
+        lexical_index = load_lexical_index(rag.lexical_index_dir(collection.name, backend))
+        hits, _ = lexical_index.search(question, limit) if lexical_index is not None else ([], {})
+        return [hit.entity.get("source") for hit in hits]
+    raise ValueError(f"unknown mode: {mode}")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] if ordered else 0.0
+
+
+def evaluate(collection, golden, mode, limit, ef, ks):
+    recalls = {k: 0.0 for k in ks if k <= limit}
+    reciprocal_ranks = 0.0
+    latencies = []
+
+    for row in golden:
+        started = time.perf_counter()
+        sources = retrieve(collection, mode, row["question"], limit, ef)
+        latencies.append(time.perf_counter() - started)
+
+        expected = row["sources"]
+        for k in recalls:
+            recalls[k] += len(expected & set(sources[:k])) / len(expected)
+        first_hit = next((rank for rank, source in enumerate(sources, start=1) if source in expected), None)
+        reciprocal_ranks += 1.0 / first_hit if first_hit else 0.0
+
+    count = len(golden)
+    return {
+        "recall": {f"@{k}": value / count for k, value in recalls.items()},
+        "mrr": reciprocal_ranks / count,
+        "latency_ms": {"p50": percentile(latencies, 50) * 1000, "p95": percentile(latencies, 95) * 1000,
+                       "mean": sum(latencies) / count * 1000}
+    }
+
+
+def eval_collection_name(collection_name, chunk_size):
+    return f"{collection_name}_eval_cs{chunk_size}"
+
+
+def print_row(result):
+    recall = " ".join(f"R{k}={value:.3f}" for k, value in result["recall"].items())
+    index = f"M={result['hnsw_m']},efC={result['ef_construction']},ef={result['ef']}" if result["hnsw_m"] else "exact"
+    print(f"{result['mode']:<8}{result['chunk_size'] or '-':>6}  {index:<24}{result['limit']:>6}  {recall}  MRR={result['mrr']:.3f}"
+          f"  p50={result['latency_ms']['p50']:.1f}ms p95={result['latency_ms']['p95']:.1f}ms")
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="포텐데이 FAQ 검색 품질/지연 시간 평가")
+    parser.add_argument("golden", help="golden 질문 세트 JSONL 경로")
+    parser.add_argument("--collection", default="potenday_faq")
+    parser.add_argument("--backend", choices=["milvus", "local"], default=rag.RAG_BACKEND)
+    parser.add_argument("--mode", default="hybrid", help="hybrid,vector,lexical 중 쉼표로 구분")
+    parser.add_argument("--limit", type=int_list, default=[10], help="검색 chunk 수 (예: 5,10,20)")
+    parser.add_argument("--k", type=int_list, default=[1, 3, 5, 10], help="recall@k 의 k 목록")
+    parser.add_argument("--ef", type=int_list, default=[rag.SEARCH_EF], help="검색 ef (milvus)")
+    parser.add_argument("--hnsw-m", type=int_list, help="HNSW M (milvus, 평가용 컬렉션 인덱스 재생성)")
+    parser.add_argument("--ef-construction", type=int_list, help="HNSW efConstruction (milvus, 평가용 컬렉션 인덱스 재생성)")
+    parser.add_argument("--chunk-size", type=int_list, help="chunk 크기(postProcessMaxSize) - 크기별 평가용 컬렉션을 적재")
+    parser.add_argument("--cache-only", action="store_true", help="질문 embedding이 캐시에 없으면 API를 호출하지 않고 중단")
+    parser.add_argument("--output", help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    golden = load_golden_set(args.golden)
+    modes = [mode.strip() for mode in args.mode.split(",") if mode.strip()]
+    milvus = args.backend == "milvus"
+    index_sweep = milvus and (args.hnsw_m or args.ef_construction)
+    if not milvus and (args.hnsw_m or args.ef_construction or args.ef != [rag.SEARCH_EF]):
+        print("local backend는 전체 내적 계산(exact)이므로 ef / M / efConstruction 값은 사용하지 않습니다")
+
+    api_calls = ensure_query_embeddings(golden, args.cache_only)
+    print(f"golden 질문 {len(golden)}개, 질문 embedding API 호출 {api_calls}건")
+
+    # chunk 크기 / 인덱스 파라미터를 바꾸는 평가는 서비스 컬렉션이 아닌 평가용 컬렉션에서 수행
+    chunk_sizes = args.chunk_size or ([rag.SEGMENTATION_MAX_SIZE] if index_sweep else [None])
+    index_grid = list(itertools.product(args.hnsw_m or [rag.HNSW_M], args.ef_construction or [rag.HNSW_EF_CONSTRUCTION])) if milvus else [(None, None)]
+    ef_values = args.ef if milvus else [rag.SEARCH_EF]
+
+    results = []
+    for chunk_size in chunk_sizes:
+        collection_name = args.collection
+        if chunk_size is not None:
+            collection_name = eval_collection_name(args.collection, chunk_size)
+            rag.sync_collection(collection_name, backend=args.backend, chunk_size=chunk_size)
+
+        for m, ef_construction in index_grid:
+            if index_sweep:
+                rag.indexing(collection_name, m=m, ef_construction=ef_construction, replace=True)
+            collection = rag.get_collection(collection_name, args.backend)
+
+            for mode, limit, ef in itertools.product(modes, args.limit, ef_values):
+                result = evaluate(collection, golden, mode, limit, ef, args.k)
+                result.update({"mode": mode, "chunk_size": chunk_size, "hnsw_m": m, "ef_construction": ef_construction,
+                               "ef": ef if milvus else None, "limit": limit, "chunks": collection.num_entities})
+                print_row(result)
+                results.append(result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"golden": args.golden, "questions": len(golden), "backend": args.backend,
+                                                 "results": results}, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"평가 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
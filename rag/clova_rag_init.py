@@ -1,28 +1,25 @@
+import argparse
 from datetime import datetime
 
 import rag.clova_rag_module as rag
+from common.clova_http_client import connection_stats
 
 # ---------------------------
 # RAG 초기 설정 : 벡터화 후 적재
+#   sync : 바뀐 HTML 파일의 chunk만 upsert, 사라진 chunk 삭제 (컬렉션은 계속 서비스)
+#   full : 컬렉션 삭제 후 전체 재적재
 # ---------------------------
+parser = argparse.ArgumentParser(description="포텐데이 FAQ RAG 적재")
+parser.add_argument("--mode", choices=["sync", "full"], default="sync")
+parser.add_argument("--collection", default="potenday_faq")
+parser.add_argument("--backend", choices=["milvus", "local"], default=rag.RAG_BACKEND)
+args = parser.parse_args()
 
-# HTML 로딩
-potendaydatas_flattened = rag.load_html_files_and_replace_source()
+# HTML 로딩 -> 문단 나누기 -> 벡터화 -> Milvus(또는 로컬 인덱스) 적재 및 인덱스 생성
+rag.sync_collection(args.collection, full=(args.mode == "full"), backend=args.backend)
 
-# 텍스트 문단 나누기
-chunked_html = rag.chunking(potendaydatas_flattened)
+# HTTP keep-alive 연결 재사용 지표
+stats = connection_stats()
+print(f"HTTP 요청 {stats['requests']}건, 신규 연결 {stats['new_connections']}건, 재사용률 {stats['reuse_ratio']:.1%}")
 
-# 텍스트 벡터화
-chunked_html_vector = rag.embedding(chunked_html)
-
-# Milvus 컬렉션 삭제
-collection_name = "potenday_faq"
-rag.drop_collection_if_exists(collection_name)
-
-# Milvus 벡터 적재
-rag.save_vector_in_collection(collection_name, chunked_html_vector)
-
-# Milvus 인덱스 생성
-rag.indexing(collection_name)
-
-print(f"-------------------- RAG 초기 설정 완료({datetime.now()}) -------------------- ")
\ No newline at end of file
+print(f"-------------------- RAG 초기 설정 완료({datetime.now()}) -------------------- ")
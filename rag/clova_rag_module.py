@@ -2,13 +2,25 @@ import os
 from dotenv import load_dotenv
 
 import json
-from tqdm import tqdm
+import time
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from langchain_community.document_loaders import UnstructuredHTMLLoader
-from langchain_community.document_loaders import UnstructuredHTMLLoader
-from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 
 import rag.clova_executor as executor
+from rag.clova_embedding_cache import EmbeddingCache, RAG_CACHE_DIR
+from rag.clova_rag_pipeline import StreamingPipeline, Stage
+from rag.clova_local_index import LocalCollection
+from rag.clova_context_packer import pack_references
+from rag.clova_lexical_index import LexicalIndex, LEXICAL_INDEX_DIR, load_lexical_index, reciprocal_rank_fusion
+from common.clova_http_client import get_session, CLOVASTUDIO_HOST, CLOVASTUDIO_APIGW_HOST
+from common.clova_async_http_client import close_async_client
+from common.clova_corpus_version import bump_corpus_version
+from common import clova_tracing as tracing
 
 
 
@@ -22,118 +34,241 @@ REQUEST_ID_FOR_SEGMENTATION = os.getenv("X-NCP-CLOVASTUDIO-REQUEST-ID-FOR-SEGMEN
 REQUEST_ID_FOR_EMBEDDING = os.getenv("X-NCP-CLOVASTUDIO-REQUEST-ID-FOR-EMBEDDING")
 REQUEST_ID_FOR_COMPLETION = os.getenv("X-NCP-CLOVASTUDIO-REQUEST-ID-FOR-COMPLETION")
 
+# 벡터 검색 backend : milvus(Milvus 서버) / local(프로세스 내 NumPy 인덱스)
+RAG_BACKEND = os.getenv("RAG-BACKEND", "milvus")
+
+# 어휘 검색 fast path : 1위 chunk가 질의 토큰(idf 가중)을 이 비율 이상 포함하고, 2위보다 점수가 이 배수 이상이면 embedding 생략
+LEXICAL_FASTPATH_COVERAGE = float(os.getenv("LEXICAL-FASTPATH-COVERAGE", "0.9"))
+LEXICAL_FASTPATH_MARGIN = float(os.getenv("LEXICAL-FASTPATH-MARGIN", "1.5"))
+
+# Embedding 동시 요청 수 / 초당 요청 수(CLOVA Studio QPS 할당량) / 재시도 횟수
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING-MAX-WORKERS", "4"))
+EMBEDDING_QPS = float(os.getenv("EMBEDDING-QPS", "5"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING-MAX-RETRIES", "3"))
+
+# HTML 파싱 process 수
+HTML_PARSE_WORKERS = int(os.getenv("HTML-PARSE-WORKERS", str(os.cpu_count() or 1)))
+
+# Segmentation 동시 요청 수
+SEGMENTATION_MAX_WORKERS = int(os.getenv("SEGMENTATION-MAX-WORKERS", "2"))
+
+# Milvus 한 번에 적재할 chunk 수
+INSERT_BATCH_SIZE = int(os.getenv("INSERT-BATCH-SIZE", "256"))
+
+# chunk 크기(Segmentation postProcessMaxSize) / HNSW 인덱스 파라미터 / 검색 시 ef
+SEGMENTATION_MAX_SIZE = int(os.getenv("SEGMENTATION-MAX-SIZE", "100"))
+HNSW_M = int(os.getenv("HNSW-M", "8"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW-EF-CONSTRUCTION", "200"))
+SEARCH_EF = int(os.getenv("SEARCH-EF", "64"))
+
+# 배치 질의 : 질문 embedding 동시 요청 수 / completion 동시 요청 수
+BATCH_EMBED_CONCURRENCY = int(os.getenv("BATCH-EMBED-CONCURRENCY", "8"))
+BATCH_COMPLETION_CONCURRENCY = int(os.getenv("BATCH-COMPLETION-CONCURRENCY", "4"))
+
+# Embedding 캐시 (프로세스 전체에서 공유, 최초 사용 시 생성)
+_embedding_cache = None
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+# 증분 동기화 시 파일/chunk fingerprint 기록
+SYNC_MANIFEST_PATH = Path(RAG_CACHE_DIR) / "sync_manifest.json"
+
+# HTML 파일별 파싱 결과 캐시 (mtime/hash가 같으면 다시 파싱하지 않음)
+PARSED_HTML_CACHE_DIR = Path(RAG_CACHE_DIR) / "parsed_html"
+
+# Segmentation 결과 캐시 (같은 문서/설정이면 API를 다시 호출하지 않음)
+SEGMENTATION_CACHE_DIR = Path(RAG_CACHE_DIR) / "segmentation"
 
 
 # ---------------------------
 # LangChain 활용 HTML 로딩
 # ---------------------------
-def load_html_files_and_replace_source():
-    # HTML 파일이 저장된 디렉토리
-    html_files_dir = Path('./potendayguide')
-    html_files = list(html_files_dir.glob("*.html"))
+@lru_cache(maxsize=4)
+def _read_filename_to_url_map(path, mtime_ns):
+    with open(path, "r") as map_file:
+        return json.load(map_file)
 
-    # filename-to-URL 매핑 정보 로드
-    with open("filename_to_url_map.json", "r") as map_file:
-        filename_to_url_map = json.load(map_file)
-    
-    potendaydatas = []
-    
-    # HTML 파일 로딩하고, 'source' 값 대체
-    for html_file in html_files:
-        loader = UnstructuredHTMLLoader(str(html_file))
-        document_data = loader.load()
-
-        # 각 Document의 'source' 값을 URL로 대체
-        for doc in document_data:
-            extracted_filename = doc.metadata["source"].split("/")[-1]
-            if extracted_filename in filename_to_url_map:
-                doc.metadata["source"] = filename_to_url_map[extracted_filename]
-            else:
-                print(f"Warning: {extracted_filename}에 해당하는 URL을 찾을 수 없습니다.")
+def load_filename_to_url_map(path="filename_to_url_map.json"):
+    # filename-to-URL 매핑 정보 로드 (파일이 바뀌지 않았으면 다시 읽지 않음)
+    return _read_filename_to_url_map(path, os.stat(path).st_mtime_ns)
 
-        potendaydatas.append(document_data)
-        print(f"Processed {html_file}")
-    
-    # 데이터 플래튼(flatten) 처리
-    potendaydatas_flattened = [item for sublist in potendaydatas for item in sublist]
+def list_html_files():
+    # HTML 파일이 저장된 디렉토리
+    html_files_dir = Path('./potendayguide')
+    return sorted(html_files_dir.glob("*.html"))
+
+def _parse_html_file(html_file):
+    # process pool에서 실행되므로 pickle 가능한 dict로 반환
+    from langchain_community.document_loaders import UnstructuredHTMLLoader
+
+    loader = UnstructuredHTMLLoader(str(html_file))
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in loader.load()]
+
+def _parsed_html_cache_path(html_file):
+    return PARSED_HTML_CACHE_DIR / f"{html_file.name}.json"
+
+def read_parsed_html_cache(html_file):
+    cache_path = _parsed_html_cache_path(html_file)
+    if not cache_path.exists():
+        return None
+
+    with open(cache_path, "r") as cache_file:
+        entry = json.load(cache_file)
+
+    # mtime/크기가 같으면 그대로 사용, 다르면 내용 hash로 한 번 더 확인
+    stat = html_file.stat()
+    if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry["documents"]
+    if entry["sha256"] == hashlib.sha256(html_file.read_bytes()).hexdigest():
+        write_parsed_html_cache(html_file, entry["documents"])
+        return entry["documents"]
+    return None
+
+def write_parsed_html_cache(html_file, documents):
+    stat = html_file.stat()
+    entry = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(html_file.read_bytes()).hexdigest(),
+        "documents": documents
+    }
 
-    return potendaydatas_flattened
+    cache_path = _parsed_html_cache_path(html_file)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as cache_file:
+        json.dump(entry, cache_file, ensure_ascii=False)
+    tmp_path.replace(cache_path)
+
+def parse_html_file(html_file, pool=None):
+    documents = read_parsed_html_cache(html_file)
+    if documents is None:
+        documents = pool.submit(_parse_html_file, html_file).result() if pool else _parse_html_file(html_file)
+        write_parsed_html_cache(html_file, documents)
+    return documents
+
+def replace_source(parsed_documents, filename_to_url_map):
+    from langchain_core.documents import Document
+
+    document_data = []
+
+    # 각 Document의 'source' 값을 URL로 대체
+    for parsed in parsed_documents:
+        doc = Document(page_content=parsed["page_content"], metadata=dict(parsed["metadata"]))
+        extracted_filename = doc.metadata["source"].split("/")[-1]
+        doc.metadata["file_name"] = extracted_filename
+        if extracted_filename in filename_to_url_map:
+            doc.metadata["source"] = filename_to_url_map[extracted_filename]
+        else:
+            print(f"Warning: {extracted_filename}에 해당하는 URL을 찾을 수 없습니다.")
+        document_data.append(doc)
+
+    return document_data
+
+def load_html_file(html_file, filename_to_url_map, pool=None):
+    return replace_source(parse_html_file(html_file, pool), filename_to_url_map)
 
 # ---------------------------
 # Chunking : 문단 나누기
 # ---------------------------
-def chunking(potendaydatas_flattened):
-    segmentation_executor = executor.SegmentationExecutor(
-        host='clovastudio.apigw.ntruss.com',
+def make_chunk_id(source, text):
+    # chunk fingerprint : 출처와 본문이 같으면 같은 id (Milvus primary key)
+    return hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()
+
+def get_segmentation_executor():
+    return executor.SegmentationExecutor(
+        host=CLOVASTUDIO_APIGW_HOST,
         api_key=API_KEY,
         api_key_primary_val=APIGW_API_KEY,
         request_id=REQUEST_ID_FOR_SEGMENTATION
     )
 
-    chunked_html = []
+def _segmentation_cache_path(request_data):
+    key = hashlib.sha256(json.dumps(request_data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return SEGMENTATION_CACHE_DIR / f"{key}.json"
+
+def segment_text(segmentation_executor, request_data):
+    cache_path = _segmentation_cache_path(request_data)
+    try:
+        with open(cache_path, "r") as cache_file:
+            return json.load(cache_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    response_data = segmentation_executor.execute(request_data)
+    if response_data != 'Error':
+        SEGMENTATION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as cache_file:
+            json.dump(response_data, cache_file, ensure_ascii=False)
+        tmp_path.replace(cache_path)
+    return response_data
 
-    for htmldata in tqdm(potendaydatas_flattened):
-        try:
-            request_data = {
-                "postProcessMaxSize": 100,
-                "alpha": -100,
-                "segCnt": -1,
-                "postProcessMinSize": -1,
-                "text": htmldata.page_content,
-                "postProcess": True
-            }
-             
-            request_json_string = json.dumps(request_data)
-            request_data = json.loads(request_json_string, strict=False)
-            response_data = segmentation_executor.execute(request_data)
-            result_data = [' '.join(segment) for segment in response_data]
- 
-        except json.JSONDecodeError as e:
-            print(f"JSON decoding failed: {e}")
-        except Exception as e:
-            print(f"An error occurred: {e}")
-         
-        for paragraph in result_data:
-            chunked_document = {
-                "source": htmldata.metadata["source"],
-                "text": paragraph
-            }
-            chunked_html.append(chunked_document)
-    
-    return chunked_html
+def chunk_document(segmentation_executor, htmldata, max_size=SEGMENTATION_MAX_SIZE):
+    request_data = {
+        "postProcessMaxSize": max_size,
+        "alpha": -100,
+        "segCnt": -1,
+        "postProcessMinSize": -1,
+        "text": htmldata.page_content,
+        "postProcess": True
+    }
+
+    response_data = segment_text(segmentation_executor, request_data)
+    if response_data == 'Error':
+        raise ValueError(f"Segmentation API Error: {htmldata.metadata.get('file_name')}")
+
+    chunked_documents = []
+    for segment in response_data:
+        paragraph = ' '.join(segment)
+        chunked_documents.append({
+            "chunk_id": make_chunk_id(htmldata.metadata["source"], paragraph),
+            "source": htmldata.metadata["source"],
+            "file_name": htmldata.metadata.get("file_name"),
+            "text": paragraph
+        })
+
+    return chunked_documents
 
 # ---------------------------
 # Embedding : 벡터화
 # ---------------------------
-def embedding(chunked_html):
-    embedding_executor = executor.EmbeddingExecutor(
-        host='clovastudio.apigw.ntruss.com',
+def get_embedding_executor(qps=None):
+    return executor.EmbeddingExecutor(
+        host=CLOVASTUDIO_APIGW_HOST,
         api_key=API_KEY,
         api_key_primary_val=APIGW_API_KEY,
-        request_id=REQUEST_ID_FOR_EMBEDDING
+        request_id=REQUEST_ID_FOR_EMBEDDING,
+        rate_limiter=executor.TokenBucket(qps) if qps else None,
+        max_retries=EMBEDDING_MAX_RETRIES
     )
 
-    for i, chunked_document in enumerate(tqdm(chunked_html)):
-        try:
-            request_json = {
-                "text": chunked_document['text']
-            }
-            request_json_string = json.dumps(request_json)
-            request_data = json.loads(request_json_string, strict=False)
-            response_data = embedding_executor.execute(request_data)
-        except ValueError as e:
-            print(f"Embedding API Error. {e}")
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-         
-        chunked_document["embedding"] = response_data
-    
-    return chunked_html
+def embed_chunk(embedding_executor, cache, chunked_document):
+    # 캐시에 있는 chunk는 API 호출 없이 채움
+    vector = cache.get(embedding_executor.endpoint, chunked_document['text'])
+    if vector is None:
+        vector = embedding_executor.execute({"text": chunked_document['text']})
+        cache.put(embedding_executor.endpoint, chunked_document['text'], vector)
+    chunked_document["embedding"] = vector
+    return chunked_document
 
 # ---------------------------
-# Vector DB : Milvus 벡터 DB에 벡터 저장 및 사용
+# Vector DB : Milvus 벡터 DB(또는 로컬 인덱스)에 벡터 저장 및 사용
 # ---------------------------
-def drop_collection_if_exists(collection_name):
+def drop_collection_if_exists(collection_name, backend=RAG_BACKEND):
+    if backend == "local":
+        LocalCollection.drop(collection_name)
+        release_collection_handle(collection_name, backend)
+        print(f"로컬 컬렉션 '{collection_name}'이 삭제되었습니다.")
+        return
+
+    from pymilvus import connections, utility, Collection
+
     # Milvus 서버 연결
     connections.connect("default", host="localhost", port="19530")
 
@@ -144,16 +279,26 @@ def drop_collection_if_exists(collection_name):
         
         # 컬렉션 드롭 (모든 데이터 삭제)
         collection.drop()
+        release_collection_handle(collection_name, backend)
         print(f"컬렉션 '{collection_name}'이 삭제되었습니다.")
 
     else:
         print(f"컬렉션 '{collection_name}'이 존재하지 않습니다. 삭제를 건너뜁니다.")
 
-def save_vector_in_collection(collection_name, chunked_html):
+def create_collection_if_not_exists(collection_name, backend=RAG_BACKEND):
+    # 로컬 인덱스는 검색/적재가 같은 handle을 공유 (flush 시 새 generation으로 교체)
+    if backend == "local":
+        return get_collection(collection_name, backend)
+
+    from pymilvus import connections, utility, Collection, FieldSchema, CollectionSchema, DataType
+
     connections.connect("default", host="localhost", port="19530")
 
+    if utility.has_collection(collection_name):
+        return Collection(name=collection_name)
+
     fields = [
-        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="chunk_id", dtype=DataType.VARCHAR, max_length=64, is_primary=True, auto_id=False),
         FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=3000),
         FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=9000),
         FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=1024)
@@ -163,94 +308,504 @@ def save_vector_in_collection(collection_name, chunked_html):
     schema = CollectionSchema(fields, description="포텐데이 FAQ")
 
     # 컬렉션
-    collection = Collection(name=collection_name, schema=schema, using='default', shards_num=2)
+    return Collection(name=collection_name, schema=schema, using='default', shards_num=2)
+
+def save_vector_in_collection(collection_name, chunked_html, batch_size=INSERT_BATCH_SIZE, backend=RAG_BACKEND):
+    collection = create_collection_if_not_exists(collection_name, backend)
+
+    # chunk를 열(column) 단위로 모아 batch_size개씩 한 번에 적재 (chunked_html은 generator도 가능)
+    field_names = ["chunk_id", "source", "text", "embedding"]
+    columns = {name: [] for name in field_names}
+    inserted = 0
+    started = time.perf_counter()
+
+    def write_batch():
+        nonlocal inserted
+        collection.upsert([columns[name] for name in field_names])
+        inserted += len(columns["chunk_id"])
+        for name in field_names:
+            columns[name] = []
+
+        elapsed = time.perf_counter() - started
+        print(f"데이터 Insertion 진행: {inserted}개 ({inserted / elapsed if elapsed else 0:.1f} chunks/sec)")
 
     for item in chunked_html:
-        source_list = [item['source']]
-        text_list = [item['text']]
-        embedding_list = [item['embedding']]
-        
-        entities = [
-            source_list,
-            text_list,
-            embedding_list
-        ]
-        
-        insert_result = collection.insert(entities)
-        print("데이터 Insertion이 완료된 ID:", insert_result.primary_keys)
+        for name in field_names:
+            columns[name].append(item[name])
+        if len(columns["chunk_id"]) >= batch_size:
+            write_batch()
+
+    if columns["chunk_id"]:
+        write_batch()
+
+    collection.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"데이터 Insertion이 전부 완료되었습니다: {inserted}개, {elapsed:.1f}s, "
+          f"{inserted / elapsed if elapsed else 0:.1f} chunks/sec")
+
+    return inserted
+
+def delete_chunks_from_collection(collection_name, chunk_ids, batch_size=500, backend=RAG_BACKEND):
+    collection = create_collection_if_not_exists(collection_name, backend)
+
+    chunk_ids = list(chunk_ids)
+    if backend == "local":
+        collection.delete_ids(chunk_ids)
+        collection.flush()
+        print(f"삭제된 chunk 수: {len(chunk_ids)}")
+        return
+
+    for start in range(0, len(chunk_ids), batch_size):
+        batch = chunk_ids[start:start + batch_size]
+        collection.delete(expr=f"chunk_id in {json.dumps(batch)}")
 
-    print("데이터 Insertion이 전부 완료되었습니다")
+    print(f"삭제된 chunk 수: {len(chunk_ids)}")
+
+def indexing(collection_name, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, replace=False):
+    from pymilvus import connections, utility, Collection
 
-def indexing(collection_name):
     connections.connect("default", host="localhost", port="19530")
 
     index_params = {
         "metric_type": "IP",
         "index_type": "HNSW",
         "params": {
-            "M": 8,
-            "efConstruction": 200
+            "M": m,
+            "efConstruction": ef_construction
         }
     }
 
     collection = Collection(collection_name)
+    if replace and collection.indexes:
+        # 인덱스 교체 : release -> drop -> 재생성 후 다시 load (서비스 중인 컬렉션에는 사용하지 않음)
+        collection.release()
+        collection.drop_index()
+        release_collection_handle(collection_name, "milvus")
     collection.create_index(field_name="embedding", index_params=index_params)
     utility.index_building_progress(collection_name)
     
     print([index.params for index in collection.indexes])
 
-def get_collection_from_milvus(collection_name):
-    connections.connect("default", host="localhost", port="19530")
-    collection = Collection(collection_name)
+# 서비스 경로 : Milvus 연결과 load된 컬렉션을 프로세스 전체에서 재사용 (매 질문마다 connect/load 하지 않음)
+_loaded_collections = {}
+_loaded_collections_lock = threading.Lock()
+
+# 검색 전용 연결 : 재연결 시 적재(sync)/관리 작업이 쓰는 "default" 연결은 건드리지 않음
+MILVUS_SEARCH_ALIAS = "rag_search"
+
+def get_collection_from_milvus(collection_name, refresh=False, stale=None):
+    # refresh : 연결이 끊긴 handle(stale)을 버리고 재연결, 다른 스레드가 이미 재연결했으면 그 handle 사용
+    from pymilvus import connections, Collection
+
+    with _loaded_collections_lock:
+        collection = _loaded_collections.get(("milvus", collection_name))
+        if collection is not None and (not refresh or collection is not stale):
+            return collection
+
+        if refresh:
+            connections.disconnect(MILVUS_SEARCH_ALIAS)
+        connections.connect(MILVUS_SEARCH_ALIAS, host="localhost", port="19530")
+        collection = Collection(collection_name, using=MILVUS_SEARCH_ALIAS)
+        collection.load()
+
+        _loaded_collections[("milvus", collection_name)] = collection
+        return collection
+
+def cached_chunk_embeddings(texts):
+    # 적재 때 embedding 캐시에 저장된 chunk 원본 벡터 (양자화된 로컬 인덱스의 재적재 / recall 점검용)
+    return get_embedding_cache().get_many(get_query_embedding_executor().endpoint, texts)
+
+def get_local_collection(collection_name):
+    with _loaded_collections_lock:
+        collection = _loaded_collections.get(("local", collection_name))
+        if collection is None:
+            # 벡터 파일을 memory-map 하는 것으로 로딩 완료
+            collection = LocalCollection(collection_name, original_vectors=cached_chunk_embeddings)
+            collection.load()
+            _loaded_collections[("local", collection_name)] = collection
+        return collection
+
+def get_collection(collection_name, backend=RAG_BACKEND):
+    if backend == "local":
+        return get_local_collection(collection_name)
+    return get_collection_from_milvus(collection_name)
+
+def release_collection_handle(collection_name, backend=RAG_BACKEND):
+    with _loaded_collections_lock:
+        _loaded_collections.pop((backend, collection_name), None)
+
+def warm_up(collection_name, backend=RAG_BACKEND):
+    # 앱 시작 시 호출 : 첫 질문 전에 컬렉션 연결/load + HTTP 세션 준비
+    started = time.perf_counter()
+    get_collection(collection_name, backend)
+    get_session()
+    print(f"RAG warm-up 완료: {collection_name} [{backend}] ({time.perf_counter() - started:.2f}s)")
+
+# ---------------------------
+# 증분 동기화 : 바뀐 HTML 파일만 다시 chunking/embedding 후 upsert, 사라진 chunk 삭제
+# ---------------------------
+def file_fingerprint(html_file, filename_to_url_map, chunk_size=SEGMENTATION_MAX_SIZE):
+    digest = hashlib.sha256(html_file.read_bytes())
+    # URL 매핑이나 chunk 크기가 바뀌어도 chunk가 바뀌므로 fingerprint에 포함
+    digest.update(str(filename_to_url_map.get(html_file.name)).encode("utf-8"))
+    digest.update(f"chunk_size={chunk_size}".encode("utf-8"))
+    return digest.hexdigest()
+
+def sync_manifest_key(collection_name, backend=RAG_BACKEND):
+    return collection_name if backend == "milvus" else f"{backend}/{collection_name}"
+
+def load_sync_manifest(collection_name):
+    if not SYNC_MANIFEST_PATH.exists():
+        return {}
+    with open(SYNC_MANIFEST_PATH, "r") as manifest_file:
+        return json.load(manifest_file).get(collection_name, {})
+
+def save_sync_manifest(collection_name, manifest):
+    manifests = {}
+    if SYNC_MANIFEST_PATH.exists():
+        with open(SYNC_MANIFEST_PATH, "r") as manifest_file:
+            manifests = json.load(manifest_file)
+    manifests[collection_name] = manifest
+
+    SYNC_MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SYNC_MANIFEST_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(manifests, manifest_file, ensure_ascii=False)
+    tmp_path.replace(SYNC_MANIFEST_PATH)
+
+def iter_collection_rows(collection):
+    if isinstance(collection, LocalCollection):
+        yield from collection.rows()
+        return
+
+    load_milvus_collection(collection)
+    iterator = collection.query_iterator(batch_size=1000, expr='chunk_id != ""', output_fields=["chunk_id", "source", "text"])
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+        for row in rows:
+            yield row["chunk_id"], row["source"], row["text"]
+
+def lexical_index_dir(collection_name, backend=RAG_BACKEND):
+    return LEXICAL_INDEX_DIR / sync_manifest_key(collection_name, backend)
+
+def build_lexical_index(collection_name, backend=RAG_BACKEND):
+    # 적재된 전체 chunk로 BM25 역색인 재생성
+    collection = create_collection_if_not_exists(collection_name, backend)
+    LexicalIndex.build(lexical_index_dir(collection_name, backend), iter_collection_rows(collection))
+
+def load_milvus_collection(collection):
+    # Milvus는 인덱스가 있고 load된 컬렉션에만 query / search 가능
+    if not any(index.field_name == "embedding" for index in collection.indexes):
+        indexing(collection.name)
+    collection.load()
 
-    return collection
+def existing_chunk_ids(collection, fresh=False):
+    # fresh : 방금 생성(또는 삭제 후 재생성)한 컬렉션 -> 조회하지 않음
+    if isinstance(collection, LocalCollection):
+        return set() if fresh else collection.chunk_ids()
+    if fresh or collection.num_entities == 0:
+        return set()
+
+    load_milvus_collection(collection)
+    iterator = collection.query_iterator(batch_size=1000, expr='chunk_id != ""', output_fields=["chunk_id"])
+    chunk_ids = set()
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+        chunk_ids.update(row["chunk_id"] for row in rows)
+    return chunk_ids
+
+def sync_collection(collection_name, full=False, backend=RAG_BACKEND, chunk_size=SEGMENTATION_MAX_SIZE):
+    manifest_key = sync_manifest_key(collection_name, backend)
+    created = False
+
+    if backend == "milvus":
+        from pymilvus import connections, utility, Collection
+
+        connections.connect("default", host="localhost", port="19530")
+        created = not utility.has_collection(collection_name)
+
+        # 이전 스키마(auto_id INT64)는 chunk 단위 upsert/delete가 불가능하므로 재생성
+        if utility.has_collection(collection_name):
+            field_names = [field.name for field in Collection(collection_name).schema.fields]
+            if "chunk_id" not in field_names:
+                print(f"컬렉션 '{collection_name}'이 이전 스키마입니다. 전체 재생성합니다.")
+                full = True
+
+    if full:
+        drop_collection_if_exists(collection_name, backend)
+        manifest = {}
+    else:
+        manifest = load_sync_manifest(manifest_key)
+
+    collection = create_collection_if_not_exists(collection_name, backend)
+
+    # 파일 fingerprint 비교
+    filename_to_url_map = load_filename_to_url_map()
+    html_files = list_html_files()
+    fingerprints = {html_file.name: file_fingerprint(html_file, filename_to_url_map, chunk_size) for html_file in html_files}
+    changed_files = [f for f in html_files if manifest.get(f.name, {}).get("file_hash") != fingerprints[f.name]]
+    removed_files = [name for name in manifest if name not in fingerprints]
+    print(f"HTML 파일 {len(html_files)}개 중 변경 {len(changed_files)}개, 삭제 {len(removed_files)}개")
+
+    new_manifest = {name: entry for name, entry in manifest.items() if name in fingerprints}
+
+    # 바뀐 파일만 로딩 -> chunking -> embedding -> upsert 를 스트리밍 파이프라인으로 동시에 처리
+    stored_ids = existing_chunk_ids(collection, fresh=full or created)
+    chunk_ids_by_file = defaultdict(list)
+    failed_files = set()
+    queued_ids = set()
+    embedded_ids = set()
+    state_lock = threading.Lock()
+
+    segmentation_executor = get_segmentation_executor()
+    embedding_executor = get_embedding_executor(EMBEDDING_QPS)
+    cache = get_embedding_cache()
+
+    parse_pool = ProcessPoolExecutor(max_workers=HTML_PARSE_WORKERS)
+
+    def parse(html_file):
+        return load_html_file(html_file, filename_to_url_map, parse_pool)
+
+    def segment(htmldata):
+        chunks = chunk_document(segmentation_executor, htmldata, chunk_size)
+        new_chunks = []
+        with state_lock:
+            for chunk in chunks:
+                chunk_ids_by_file[chunk["file_name"]].append(chunk["chunk_id"])
+                # 컬렉션에 없는 chunk만 embedding (중복 chunk는 한 번만)
+                if chunk["chunk_id"] not in stored_ids and chunk["chunk_id"] not in queued_ids:
+                    queued_ids.add(chunk["chunk_id"])
+                    new_chunks.append(chunk)
+        return new_chunks
+
+    def embed(chunked_document):
+        return [embed_chunk(embedding_executor, cache, chunked_document)]
+
+    def fail_file(file_name, e):
+        with state_lock:
+            failed_files.add(file_name)
+        print(f"An error occurred: {e}")
+
+    def track_embedded(chunks):
+        for chunk in chunks:
+            embedded_ids.add(chunk["chunk_id"])
+            yield chunk
+
+    pipeline = StreamingPipeline([
+        Stage("parse", parse, workers=HTML_PARSE_WORKERS, on_error=lambda html_file, e: fail_file(html_file.name, e)),
+        Stage("segment", segment, workers=SEGMENTATION_MAX_WORKERS,
+              on_error=lambda htmldata, e: fail_file(htmldata.metadata["file_name"], e)),
+        Stage("embed", embed, workers=EMBEDDING_MAX_WORKERS,
+              on_error=lambda chunk, e: print(f"Embedding API Error. {e}")),
+    ])
+    try:
+        upserted = pipeline.run(changed_files, lambda chunks: save_vector_in_collection(collection_name, track_embedded(chunks), backend=backend))
+    finally:
+        parse_pool.shutdown()
+    pipeline.print_stats()
+
+    # 파일 단위로 manifest 갱신 (하나라도 실패한 파일은 이전 상태 유지 -> 다음 동기화 때 재시도)
+    for html_file in changed_files:
+        file_name = html_file.name
+        chunk_ids = chunk_ids_by_file.get(file_name, [])
+        missing = [cid for cid in chunk_ids if cid not in stored_ids and cid not in embedded_ids]
+        if file_name in failed_files or missing:
+            print(f"Warning: {file_name} 동기화 실패, 이전 상태를 유지합니다.")
+            if file_name not in manifest:
+                new_manifest.pop(file_name, None)
+            continue
+        new_manifest[file_name] = {"file_hash": fingerprints[file_name], "chunk_ids": sorted(set(chunk_ids))}
+
+    # 어떤 파일에도 속하지 않는 chunk 삭제
+    current_ids = {cid for entry in new_manifest.values() for cid in entry["chunk_ids"]}
+    stale_ids = stored_ids - current_ids
+    if stale_ids:
+        delete_chunks_from_collection(collection_name, stale_ids, backend=backend)
+
+    collection.flush()
+    if backend == "milvus" and not any(index.field_name == "embedding" for index in collection.indexes):
+        indexing(collection_name)
+
+    save_sync_manifest(manifest_key, new_manifest)
+
+    # 코퍼스가 바뀌었거나 아직 없으면 어휘 인덱스 재생성
+    if upserted or stale_ids or load_lexical_index(lexical_index_dir(collection_name, backend)) is None:
+        build_lexical_index(collection_name, backend)
+
+    # 코퍼스가 바뀌었으면 답변 캐시가 무효화되도록 버전 갱신
+    if upserted or stale_ids:
+        bump_corpus_version(collection_name)
+    print(f"동기화 완료: upsert {upserted}개, 삭제 {len(stale_ids)}개, 전체 chunk {len(current_ids)}개")
 
 # ---------------------------
 # Retrieval -> HyperCLOVA X
 # ---------------------------
-def query_embed(text: str):
-    request_data = {"text": text}
+# 질의 시점 executor는 상태가 없으므로 프로세스에서 한 번만 생성해 재사용
+@lru_cache(maxsize=1)
+def get_query_embedding_executor():
+    return executor.EmbeddingExecutor(
+        host=CLOVASTUDIO_APIGW_HOST,
+        api_key=API_KEY,
+        api_key_primary_val=APIGW_API_KEY,
+        request_id=REQUEST_ID_FOR_EMBEDDING
+    )
 
-    embedding_executor = executor.EmbeddingExecutor(
-        host='clovastudio.apigw.ntruss.com',
+@lru_cache(maxsize=1)
+def get_async_query_embedding_executor():
+    return executor.AsyncEmbeddingExecutor(
+        host=CLOVASTUDIO_APIGW_HOST,
         api_key=API_KEY,
         api_key_primary_val=APIGW_API_KEY,
         request_id=REQUEST_ID_FOR_EMBEDDING
     )
 
-    response_data = embedding_executor.execute(request_data)
+def query_embed(text: str):
+    request_data = {"text": text}
+    embedding_executor = get_query_embedding_executor()
+
+    with tracing.span("rag.query_embed"):
+        cache = get_embedding_cache()
+        response_data = cache.get(embedding_executor.endpoint, text)
+        if response_data is None:
+            response_data = embedding_executor.execute(request_data)
+            cache.put(embedding_executor.endpoint, text, response_data)
 
     return response_data
 
-def clova_chat(collection, realquery: str) -> str:
-    query_vector = query_embed(realquery)
+async def aquery_embed(text: str):
+    request_data = {"text": text}
+    embedding_executor = get_async_query_embedding_executor()
 
-    collection.load()
+    with tracing.span("rag.query_embed"):
+        cache = get_embedding_cache()
+        response_data = cache.get(embedding_executor.endpoint, text)
+        if response_data is None:
+            response_data = await embedding_executor.execute(request_data)
+            cache.put(embedding_executor.endpoint, text, response_data)
+
+    return response_data
+
+def search_collection(collection, query_vectors, limit=10, ef=SEARCH_EF):
+    # HNSW는 ef >= limit 이어야 함
+    search_params = {"metric_type": "IP", "params": {"ef": max(ef, limit)}}
+
+    def search(target):
+        return target.search(
+            data=query_vectors,  # 검색할 벡터 데이터
+            anns_field="embedding",  # 검색을 수행할 벡터 필드 지정
+            param=search_params,
+            limit=limit,
+            output_fields=["source", "text"]
+        )
+
+    with tracing.span("rag.search"):
+        if isinstance(collection, LocalCollection):
+            return search(collection)
+
+        from pymilvus.exceptions import ConnectError, ConnectionNotExistException, MilvusUnavailableException
 
-    search_params = {"metric_type": "IP", "params": {"ef": 64}}
-    results = collection.search(
-        data=[query_vector],  # 검색할 벡터 데이터
-        anns_field="embedding",  # 검색을 수행할 벡터 필드 지정
-        param=search_params,
-        limit=10,
-        output_fields=["source", "text"]
+        try:
+            return search(collection)
+        except (ConnectError, ConnectionNotExistException, MilvusUnavailableException) as e:
+            # 연결이 끊긴 경우에만 재연결 후 한 번 더 시도 (잘못된 파라미터, 컬렉션 미load 등은 그대로 전달)
+            print(f"Milvus 연결 실패, 재연결 후 재시도합니다: {e}")
+            return search(get_collection_from_milvus(collection.name, refresh=True, stale=collection))
+
+async def asearch_collection(collection, query_vectors, limit=10, ef=SEARCH_EF):
+    # pymilvus 검색은 blocking 호출이므로 스레드에서 실행
+    return await asyncio.to_thread(search_collection, collection, query_vectors, limit, ef)
+
+@lru_cache(maxsize=1)
+def get_completion_executor():
+    return executor.CompletionExecutor(
+        host=CLOVASTUDIO_HOST,
+        api_key=API_KEY,
+        api_key_primary_val=APIGW_API_KEY,
+        request_id=REQUEST_ID_FOR_COMPLETION
     )
- 
-    reference = []
- 
-    for hit in results[0]:
-        distance = hit.distance
-        source = hit.entity.get("source")
-        text = hit.entity.get("text")
-        reference.append({"distance": distance, "source": source, "text": text})
- 
-    completion_executor = executor.CompletionExecutor(
-        host='https://clovastudio.stream.ntruss.com',
+
+@lru_cache(maxsize=1)
+def get_async_completion_executor():
+    return executor.AsyncCompletionExecutor(
+        host=CLOVASTUDIO_HOST,
         api_key=API_KEY,
         api_key_primary_val=APIGW_API_KEY,
         request_id=REQUEST_ID_FOR_COMPLETION
     )
 
+def lexical_lookup(collection, realquery: str, limit=10):
+    # (어휘 검색 hit 목록, fast path reference 또는 None)
+    backend = "local" if isinstance(collection, LocalCollection) else "milvus"
+    lexical_index = load_lexical_index(lexical_index_dir(collection.name, backend))
+    if lexical_index is None:
+        return [], None
+
+    with tracing.span("rag.lexical"):
+        lexical_hits, detail = lexical_index.search(realquery, limit)
+
+    # 정확한 단어 일치가 확실하면 embedding API / 벡터 검색 없이 어휘 검색 결과만 사용
+    if lexical_hits:
+        second = lexical_hits[1].distance if len(lexical_hits) > 1 else 0.0
+        if lexical_index.coverage(detail) >= LEXICAL_FASTPATH_COVERAGE and \
+                lexical_hits[0].distance >= LEXICAL_FASTPATH_MARGIN * second:
+            return lexical_hits, [
+                {"chunk_id": hit.id, "distance": None, "bm25": hit.distance, "score": None, "source": hit.entity.get("source"), "text": hit.entity.get("text")}
+                for hit in lexical_hits
+            ]
+
+    return lexical_hits, None
+
+def fuse_references(vector_hits, lexical_hits, limit=10):
+    # 벡터 검색 결과와 어휘 검색 결과를 RRF로 통합
+    reference = []
+    for chunk_id, score, (vector_hit, lexical_hit) in reciprocal_rank_fusion([vector_hits, lexical_hits], limit=limit):
+        hit = vector_hit or lexical_hit
+        reference.append({
+            "chunk_id": chunk_id,
+            "distance": vector_hit.distance if vector_hit else None,
+            "bm25": lexical_hit.distance if lexical_hit else None,
+            "score": score,
+            "source": hit.entity.get("source"),
+            "text": hit.entity.get("text")
+        })
+
+    return reference
+
+def retrieve_references(collection, realquery: str, limit=10, ef=SEARCH_EF):
+    lexical_hits, fast_path = lexical_lookup(collection, realquery, limit)
+    if fast_path is not None:
+        return fast_path
+
+    query_vector = query_embed(realquery)
+    results = search_collection(collection, [query_vector], limit=limit, ef=ef)
+
+    return fuse_references(results[0], lexical_hits, limit)
+
+async def aretrieve_references(collection, realquery: str, limit=10, ef=SEARCH_EF):
+    # 어휘 검색은 메모리 내 계산(1ms 미만)이라 바로 수행하고, fast path가 아닐 때만 embedding 요청
+    lexical_hits, fast_path = lexical_lookup(collection, realquery, limit)
+    if fast_path is not None:
+        return fast_path
+
+    query_vector = await aquery_embed(realquery)
+    results = await asearch_collection(collection, [query_vector], limit=limit, ef=ef)
+
+    return fuse_references(results[0], lexical_hits, limit)
+
+def build_rag_messages(realquery: str, reference) -> dict:
+    # 중복/저유사도 chunk 정리 후 토큰 예산에 맞춰 reference 구성
+    with tracing.span("rag.pack"):
+        reference, report = pack_references(reference)
+    print(f"Context packing: reference {report['references_in']} -> {report['references_out']}개, "
+          f"토큰 {report['tokens_before']} -> {report['tokens_after']} (절약 {report['tokens_saved']}, 병합 구분자 +{report['merge_overhead']})")
+
     preset_texts = [
         {"role":"system","content":"- 너의 역할은 사용자의 질문에 reference를 바탕으로 답변하는거야.\n- 상냥하고 친절하고 귀여운 어투로 대답해줘.\n- 반드시 너가 가지고 있는 지식은 모두 배제하고, 주어진 reference의 내용만을 바탕으로 답변해야해.\n- 답변의 출처가 되는 'source'도 답변과 함께 {출처: }의 형태로 제공해야해.\n- 만약 사용자의 질문이 reference와 관련이 없다면, {오잉님, 도와주세요.}라고만 반드시 말해야해.\n- 네가 가진 지식은 반드시 다 배제하고 주어진 reference에 있는 내용만을 바탕으로 대답해."},
     ]
@@ -275,17 +830,194 @@ def clova_chat(collection, realquery: str) -> str:
         "stopBefore": [],
         "includeAiFilters": False
     }
+
+    return request_data
+
+def build_rag_request(collection, realquery: str) -> dict:
+    with tracing.span("rag.retrieve"):
+        reference = retrieve_references(collection, realquery, limit=10)
+    return build_rag_messages(realquery, reference)
+
+async def abuild_rag_request(collection, realquery: str) -> dict:
+    with tracing.span("rag.retrieve"):
+        reference = await aretrieve_references(collection, realquery, limit=10)
+    return build_rag_messages(realquery, reference)
+
+def clova_chat(collection, realquery: str) -> str:
+    request_data = build_rag_request(collection, realquery)
  
     # LLM 생성 답변 반환
-    response_data = completion_executor.execute(request_data)
+    response_data = get_completion_executor().execute(request_data)
  
     return response_data
 
+def clova_chat_stream(collection, realquery: str):
+    request_data = build_rag_request(collection, realquery)
+
+    # LLM 생성 토큰을 도착하는 대로 반환
+    yield from get_completion_executor().stream(request_data)
+
+async def aclova_chat(collection, realquery: str) -> str:
+    request_data = await abuild_rag_request(collection, realquery)
+    return await get_async_completion_executor().execute(request_data)
+
+async def aclova_chat_stream(collection, realquery: str):
+    request_data = await abuild_rag_request(collection, realquery)
+    async for token in get_async_completion_executor().stream(request_data):
+        yield token
+
 # ---------------------------
 # 최종 RAG 기반 AI 응답 반환
 # ---------------------------
-def chat_with_rag(user_message, collection_name):
-    collection = get_collection_from_milvus(collection_name)
+def chat_with_rag(user_message, collection_name, backend=RAG_BACKEND):
+    collection = get_collection(collection_name, backend)
     clova_message = clova_chat(collection, user_message)
 
-    return clova_message
\ No newline at end of file
+    return clova_message
+
+def chat_with_rag_stream(user_message, collection_name, backend=RAG_BACKEND):
+    collection = get_collection(collection_name, backend)
+    yield from clova_chat_stream(collection, user_message)
+
+# asyncio 버전 : 첫 호출의 Milvus 연결/load는 스레드에서 수행
+async def achat_with_rag(user_message, collection_name, backend=RAG_BACKEND):
+    collection = await asyncio.to_thread(get_collection, collection_name, backend)
+    return await aclova_chat(collection, user_message)
+
+async def achat_with_rag_stream(user_message, collection_name, backend=RAG_BACKEND):
+    collection = await asyncio.to_thread(get_collection, collection_name, backend)
+    async for token in aclova_chat_stream(collection, user_message):
+        yield token
+
+# ---------------------------
+# 배치 질의 : 회귀 테스트 / 캐시 예열용으로 많은 질문을 한 번에 답변
+#   어휘 검색 fast path -> 나머지 질문 embedding 동시 요청 -> 한 번의 벡터 검색(data=[...])
+#   -> completion 동시 요청(concurrency 제한) -> 끝나는 순서대로 JSONL 한 줄씩 기록
+# ---------------------------
+def _elapsed_ms(started, finished=None):
+    return round(((finished or time.perf_counter()) - started) * 1000, 1)
+
+async def aembed_queries(texts, concurrency=BATCH_EMBED_CONCURRENCY, qps=EMBEDDING_QPS):
+    # 질문별 (embedding 또는 예외, 소요 시간 ms), 캐시에 있는 질문은 API 호출 없음
+    embedding_executor = executor.AsyncEmbeddingExecutor(
+        host=CLOVASTUDIO_APIGW_HOST,
+        api_key=API_KEY,
+        api_key_primary_val=APIGW_API_KEY,
+        request_id=REQUEST_ID_FOR_EMBEDDING,
+        rate_limiter=executor.TokenBucket(qps) if qps else None,
+        max_retries=EMBEDDING_MAX_RETRIES
+    )
+    cache = get_embedding_cache()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed(text):
+        started = time.perf_counter()
+        try:
+            vector = cache.get(embedding_executor.endpoint, text)
+            if vector is None:
+                async with semaphore:
+                    vector = await embedding_executor.execute({"text": text})
+                cache.put(embedding_executor.endpoint, text, vector)
+            return vector, _elapsed_ms(started)
+        except Exception as e:
+            return e, _elapsed_ms(started)
+
+    return await asyncio.gather(*(embed(text) for text in texts))
+
+async def achat_with_rag_batch(questions, collection_name, output_path, backend=RAG_BACKEND, limit=10, ef=SEARCH_EF,
+                               concurrency=BATCH_COMPLETION_CONCURRENCY, embed_concurrency=BATCH_EMBED_CONCURRENCY):
+    started = time.perf_counter()
+    collection = await asyncio.to_thread(get_collection, collection_name, backend)
+    rows = [{"index": i, "question": question, "timings_ms": {}} for i, question in enumerate(questions)]
+
+    # 1) 어휘 검색 : fast path 질문은 embedding / 벡터 검색 생략
+    references, lexical = {}, {}
+    for row in rows:
+        lookup_started = time.perf_counter()
+        lexical[row["index"]], fast_path = lexical_lookup(collection, row["question"], limit)
+        row["timings_ms"]["lexical"] = _elapsed_ms(lookup_started)
+        row["fast_path"] = fast_path is not None
+        if fast_path is not None:
+            references[row["index"]] = fast_path
+
+    # 2) 나머지 질문 embedding 동시 요청
+    vector_rows = [row for row in rows if not row["fast_path"]]
+    embeddings = await aembed_queries([row["question"] for row in vector_rows], embed_concurrency)
+    searchable = []
+    for row, (vector, elapsed_ms) in zip(vector_rows, embeddings):
+        row["timings_ms"]["embed"] = elapsed_ms
+        if isinstance(vector, Exception):
+            row["error"] = f"embedding: {vector}"
+        else:
+            searchable.append((row, vector))
+
+    # 3) 한 번의 검색 요청으로 모든 질문 벡터 검색 (질문별 시간은 배치 전체 시간)
+    #   검색이 실패하면 검색 대상 질문만 실패로 기록하고 fast path 질문은 계속 답변
+    if searchable:
+        search_started = time.perf_counter()
+        results, search_error = None, None
+        try:
+            results = await asearch_collection(collection, [vector for _, vector in searchable], limit=limit, ef=ef)
+        except Exception as e:
+            print(f"배치 벡터 검색 실패: {e}")
+            search_error = e
+        search_ms = _elapsed_ms(search_started)
+        for i, (row, _) in enumerate(searchable):
+            row["timings_ms"]["search_batch"] = search_ms
+            if search_error is not None:
+                row["error"] = f"search: {search_error}"
+            else:
+                references[row["index"]] = fuse_references(results[i], lexical[row["index"]], limit)
+
+    # 4) completion 동시 요청, 끝나는 순서대로 기록
+    completion_executor = get_async_completion_executor()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(row):
+        if "error" in row:
+            return row
+        async with semaphore:
+            completion_started = time.perf_counter()
+            try:
+                completion = await completion_executor.complete(build_rag_messages(row["question"], references[row["index"]]))
+                row.update({
+                    "answer": completion.content,
+                    "sources": list(dict.fromkeys(ref["source"] for ref in references[row["index"]])),
+                    "input_tokens": completion.input_length,
+                    "output_tokens": completion.output_length
+                })
+            except Exception as e:
+                row["error"] = f"completion: {e}"
+            row["timings_ms"]["completion"] = _elapsed_ms(completion_started)
+        return row
+
+    answered = failed = 0
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        for next_row in asyncio.as_completed([answer(row) for row in rows]):
+            row = await next_row
+            row["timings_ms"]["since_start"] = _elapsed_ms(started)
+            output_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            output_file.flush()
+            if "error" in row:
+                failed += 1
+            else:
+                answered += 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        "questions": len(rows),
+        "answered": answered,
+        "failed": failed,
+        "fast_path": sum(row["fast_path"] for row in rows),
+        "elapsed_s": round(elapsed, 3),
+        "questions_per_s": round(len(rows) / elapsed, 2) if elapsed else 0.0
+    }
+
+def chat_with_rag_batch(questions, collection_name, output_path, backend=RAG_BACKEND, **kwargs):
+    async def run():
+        try:
+            return await achat_with_rag_batch(questions, collection_name, output_path, backend, **kwargs)
+        finally:
+            await close_async_client()
+
+    return asyncio.run(run())
@@ -0,0 +1,198 @@
+import os
+import time
+import queue
+import threading
+from dotenv import load_dotenv
+
+# .env 파일 로드
+load_dotenv()
+
+# stage 사이 큐 크기 (작을수록 메모리 사용량이 적고, 클수록 stage 간 속도 차이를 흡수)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE-QUEUE-SIZE", "64"))
+
+# 큐 종료 신호
+_DONE = object()
+
+
+# ---------------------------
+# Stage : item 하나를 받아 0개 이상의 결과를 내보내는 함수 + worker 스레드 수
+# ---------------------------
+class Stage:
+    def __init__(self, name, func, workers=1, on_error=None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.on_error = on_error
+
+
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.first_started = None
+        self.last_finished = None
+        self._lock = threading.Lock()
+
+    def record(self, started, finished, outputs, failed):
+        with self._lock:
+            self.items_in += 1
+            self.items_out += outputs
+            self.errors += 1 if failed else 0
+            self.busy += finished - started
+            if self.first_started is None or started < self.first_started:
+                self.first_started = started
+            if self.last_finished is None or finished > self.last_finished:
+                self.last_finished = finished
+
+    def add_blocked(self, seconds):
+        with self._lock:
+            self.blocked += seconds
+
+
+class QueueStats:
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def sample(self, depth):
+        with self._lock:
+            self.samples += 1
+            self.total_depth += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    @property
+    def avg_depth(self):
+        return self.total_depth / self.samples if self.samples else 0.0
+
+
+# ---------------------------
+# 스트리밍 파이프라인 : source -> stage1 -> stage2 -> ... -> sink
+#   모든 stage가 크기 제한 큐로 연결되어 동시에 실행됨 (느린 stage가 앞 stage를 자연스럽게 멈춤)
+# ---------------------------
+class StreamingPipeline:
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE):
+        self._stages = stages
+        self._queue_size = queue_size
+        self._stop = threading.Event()
+        self.stage_stats = []
+        self.queue_stats = []
+        self.sink_busy = 0.0
+        self.elapsed = 0.0
+
+    def _put(self, out_q, item, q_stats, stage_stats=None):
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                out_q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if stage_stats is not None:
+            stage_stats.add_blocked(time.perf_counter() - started)
+        q_stats.sample(out_q.qsize())
+
+    def _get(self, in_q):
+        while not self._stop.is_set():
+            try:
+                return in_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _feed(self, source, out_q, q_stats):
+        try:
+            for item in source:
+                if self._stop.is_set():
+                    return
+                self._put(out_q, item, q_stats)
+        except Exception as e:
+            print(f"Pipeline source error: {e}")
+        finally:
+            self._put(out_q, _DONE, q_stats)
+
+    def _work(self, stage, stats, in_q, out_q, q_stats, remaining, remaining_lock):
+        while True:
+            item = self._get(in_q)
+            if item is _DONE:
+                # 같은 stage의 다른 worker도 종료하도록 신호를 되돌려 놓고, 마지막 worker만 다음 stage에 전달
+                in_q.put(_DONE)
+                with remaining_lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._put(out_q, _DONE, q_stats)
+                return
+
+            started = time.perf_counter()
+            try:
+                outputs = list(stage.func(item) or [])
+                failed = False
+            except Exception as e:
+                outputs = []
+                failed = True
+                if stage.on_error is not None:
+                    stage.on_error(item, e)
+                else:
+                    print(f"[{stage.name}] An error occurred: {e}")
+            stats.record(started, time.perf_counter(), len(outputs), failed)
+
+            for output in outputs:
+                self._put(out_q, output, q_stats, stats)
+
+    def _drain(self, in_q):
+        while True:
+            item = self._get(in_q)
+            if item is _DONE:
+                return
+            sink_started = time.perf_counter()
+            yield item
+            self.sink_busy += time.perf_counter() - sink_started
+
+    def run(self, source, sink):
+        started = time.perf_counter()
+        queues = [queue.Queue(maxsize=self._queue_size) for _ in range(len(self._stages) + 1)]
+        names = ["source"] + [stage.name for stage in self._stages]
+        self.queue_stats = [QueueStats(f"{name} ->", self._queue_size) for name in names]
+        self.stage_stats = [StageStats(stage.name, stage.workers) for stage in self._stages]
+
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0], self.queue_stats[0]), daemon=True)]
+        for i, stage in enumerate(self._stages):
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, self.stage_stats[i], queues[i], queues[i + 1], self.queue_stats[i + 1], remaining, remaining_lock),
+                    daemon=True
+                ))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            return sink(self._drain(queues[-1]))
+        finally:
+            # sink가 중간에 실패해도 나머지 stage 스레드가 큐에서 멈추지 않도록 종료
+            self._stop.set()
+            self.elapsed = time.perf_counter() - started
+
+    def print_stats(self):
+        print(f"-------------------- 파이프라인 통계 (전체 {self.elapsed:.1f}s) --------------------")
+        print(f"{'stage':<14}{'workers':>8}{'in':>8}{'out':>8}{'errors':>8}{'busy(s)':>10}{'active(s)':>11}{'blocked(s)':>12}")
+        for stats in self.stage_stats:
+            active = (stats.last_finished - stats.first_started) if stats.first_started is not None else 0.0
+            print(f"{stats.name:<14}{stats.workers:>8}{stats.items_in:>8}{stats.items_out:>8}{stats.errors:>8}"
+                  f"{stats.busy:>10.2f}{active:>11.2f}{stats.blocked:>12.2f}")
+        print(f"{'sink':<14}{1:>8}{'':>8}{'':>8}{'':>8}{self.sink_busy:>10.2f}")
+        print(f"{'queue':<14}{'avg depth':>12}{'max depth':>12}{'capacity':>10}")
+        for q_stats in self.queue_stats:
+            print(f"{q_stats.name:<14}{q_stats.avg_depth:>12.1f}{q_stats.max_depth:>12}{q_stats.maxsize:>10}")
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import asyncio
+from dotenv import load_dotenv
+
+from aiohttp import web
+
+from chatbot.chatbot_answer import acall_hyper_clovax, should_cache_reply, ANSWER_MODE, COLLECTION_NAME
+from chatbot.chatbot_answer_cache import AnswerCache
+from chatbot.chatbot_answer_router import route_question, acall_routed, log_route
+from clovastudio.clovastudio_completion_executor import refine_stats
+from common.clova_async_http_client import close_async_client
+from common.clova_http_client import connection_stats
+from common.clova_question_text import normalize_question
+from common.clova_single_flight import SingleFlight
+from common import clova_tracing as tracing
+
+# .env 파일 로드
+load_dotenv()
+
+# API 서버 설정
+ANSWER_SERVER_HOST = os.getenv("ANSWER-SERVER-HOST", "0.0.0.0")
+ANSWER_SERVER_PORT = int(os.getenv("ANSWER-SERVER-PORT", "8000"))
+
+# 유사 질문(embedding 유사도) 캐시 사용 여부
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER-CACHE-SEMANTIC", "true").lower() == "true"
+
+
+def _embed_question(question):
+    import rag.clova_rag_module as rag
+    return rag.query_embed(question)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+# ---------------------------
+# Headless FAQ API : Streamlit 없이 Slack/웹 프론트엔드에서 호출
+#   POST /v1/answer         {"question": "..."} -> {"answer", "cached", "coalesced", "elapsed_ms"}
+#   POST /v1/answer/stream  {"question": "..."} -> text/event-stream (token ... result)
+#   GET  /healthz, GET /stats, GET /metrics (Prometheus text)
+# ---------------------------
+class AnswerService:
+    def __init__(self, mode=ANSWER_MODE, collection_name=COLLECTION_NAME):
+        self.mode = mode
+        self.collection_name = collection_name
+        self.answer_cache = AnswerCache(collection_name, embed_fn=_embed_question if ANSWER_CACHE_SEMANTIC else None)
+        self.single_flight = SingleFlight()
+
+    async def on_startup(self, app):
+        # 첫 질문이 아니라 서버 시작 시점에 Milvus 연결/load 비용을 지불
+        if self.mode in ("rag", "auto"):
+            import rag.clova_rag_module as rag
+            await asyncio.to_thread(rag.warm_up, self.collection_name)
+
+    async def on_cleanup(self, app):
+        await close_async_client()
+
+    async def _read_question(self, request):
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="request body must be JSON")
+        question = str(body.get("question") or "").strip() if isinstance(body, dict) else ""
+        if not question:
+            raise web.HTTPBadRequest(text="'question' is required")
+        return question
+
+    async def _lookup_cache(self, question):
+        # 유사 질문 조회는 embedding API를 호출할 수 있으므로 스레드에서 실행
+        return await asyncio.to_thread(self.answer_cache.lookup, question)
+
+    async def _answer(self, question, question_vector, decision=None):
+        if decision is not None:
+            reply = await acall_routed(question, self.collection_name, decision=decision)
+        else:
+            reply = await acall_hyper_clovax(question, self.mode, self.collection_name)
+        if should_cache_reply(reply):
+            self.answer_cache.put(question, reply, question_vector)
+        return reply
+
+    async def _lookup_cache_traced(self, question):
+        with tracing.span("answer_cache.lookup"):
+            return await self._lookup_cache(question)
+
+    async def answer(self, request):
+        started = time.perf_counter()
+        question = await self._read_question(request)
+
+        with tracing.trace("answer") as answer_trace:
+            cached_reply, question_vector = await self._lookup_cache_traced(question)
+            if cached_reply is not None:
+                reply, cached, coalesced = cached_reply, True, False
+            else:
+                reply, coalesced = await self.single_flight.do(
+                    (self.mode, normalize_question(question)),
+                    lambda: self._answer(question, question_vector)
+                )
+                cached = False
+
+        body = {
+            "answer": reply,
+            "cached": cached,
+            "coalesced": coalesced,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        if request.query.get("trace"):
+            body["trace"] = answer_trace.breakdown()
+        return web.json_response(body)
+
+    async def _answer_stream(self, question, question_vector):
+        started = time.perf_counter()
+        decision = route_question(question, self.collection_name) if self.mode == "auto" else None
+        if self.mode != "rag" and (decision is None or decision["route"] != "rag"):
+            # chatbot 방식(auto에서 chatbot / 동시 호출로 결정된 경우 포함)은 답변이 한 번에 오므로 하나의 token으로 전달
+            yield await self._answer(question, question_vector, decision)
+            return
+
+        import rag.clova_rag_module as rag
+        tokens = []
+        async for token in rag.achat_with_rag_stream(question, self.collection_name):
+            tokens.append(token)
+            yield token
+
+        reply = "".join(tokens)
+        if decision is not None:
+            log_route(question, decision, "rag", reply, started)
+        if should_cache_reply(reply):
+            self.answer_cache.put(question, reply, question_vector)
+
+    async def answer_stream(self, request):
+        started = time.perf_counter()
+        question = await self._read_question(request)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        cached_reply, question_vector = await self._lookup_cache_traced(question)
+        if cached_reply is not None:
+            tokens, cached, coalesced = None, True, False
+        else:
+            tokens, coalesced = self.single_flight.stream(
+                (self.mode, normalize_question(question)),
+                lambda: self._answer_stream(question, question_vector)
+            )
+            cached = False
+
+        answer = cached_reply or ""
+        try:
+            if tokens is None:
+                await response.write(_sse("token", {"content": cached_reply}))
+            else:
+                async for token in tokens:
+                    if not answer:
+                        # 클라이언트 기준 첫 토큰까지의 시간 (캐시/합쳐진 요청 포함)
+                        tracing.record_span("answer_stream.ttft", started)
+                    answer += token
+                    await response.write(_sse("token", {"content": token}))
+        except Exception as e:
+            print(f"답변 스트리밍 실패: {question}: {e}")
+            await response.write(_sse("error", {"message": str(e)}))
+            return response
+        tracing.record_span("answer_stream", started)
+
+        await response.write(_sse("result", {
+            "answer": answer,
+            "cached": cached,
+            "coalesced": coalesced,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }))
+        return response
+
+    async def healthz(self, request):
+        return web.json_response({"status": "ok", "mode": self.mode})
+
+    async def stats(self, request):
+        return web.json_response({
+            "single_flight": self.single_flight.stats(),
+            "answer_cache": self.answer_cache.stats(),
+            "http": connection_stats(),
+            "stages": tracing.stage_stats(),
+            "completion_tokens": tracing.usage_stats(),
+            "refine": refine_stats()
+        })
+
+    async def metrics(self, request):
+        return web.Response(text=tracing.prometheus_text(), content_type="text/plain", charset="utf-8")
+
+
+def create_app(service=None):
+    service = service or AnswerService()
+    app = web.Application()
+    app.router.add_post("/v1/answer", service.answer)
+    app.router.add_post("/v1/answer/stream", service.answer_stream)
+    app.router.add_get("/healthz", service.healthz)
+    app.router.add_get("/stats", service.stats)
+    app.router.add_get("/metrics", service.metrics)
+    app.on_startup.append(service.on_startup)
+    app.on_cleanup.append(service.on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=ANSWER_SERVER_HOST, port=ANSWER_SERVER_PORT)